@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+SMART CLASSROOM - Camera Replay Server and Load Generator
+Mimics the IP-webcam /shot.jpg and MJPEG endpoints for benchmarking without a phone
+"""
+
+import cv2
+import numpy as np
+import argparse
+import glob
+import os
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ================= FRAME SOURCE =================
+class ReplaySource:
+    """JPEG frames replayed in a loop at a fixed frame rate"""
+    def __init__(self, frames, fps=10):
+        if not frames:
+            raise ValueError("Replay source has no frames")
+        
+        self.frames = frames
+        self.fps = fps
+        self.start_time = time.time()
+    
+    @classmethod
+    def from_path(cls, path, fps=10, max_frames=300, quality=80):
+        """Load a directory of JPEGs, a video file, or synthetic frames when path is empty"""
+        if not path:
+            return cls(cls.synthetic_frames(max_frames, quality), fps)
+        
+        if os.path.isdir(path):
+            files = sorted(glob.glob(os.path.join(path, '*.jpg')) + glob.glob(os.path.join(path, '*.jpeg')))
+            frames = []
+            for filename in files[:max_frames]:
+                with open(filename, 'rb') as f:
+                    frames.append(f.read())
+            return cls(frames, fps)
+        
+        # Video file - re-encode frames as JPEG once up front
+        capture = cv2.VideoCapture(path)
+        frames = []
+        while len(frames) < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+        capture.release()
+        return cls(frames, fps)
+    
+    @staticmethod
+    def synthetic_frames(count, quality=80, width=1280, height=720):
+        """Generate moving test frames"""
+        frames = []
+        background = np.random.randint(60, 120, (height, width, 3), dtype=np.uint8)
+        for i in range(min(count, 100)):
+            frame = background.copy()
+            x = (i * 20) % (width - 200)
+            cv2.rectangle(frame, (x, 200), (x + 200, 400), (230, 230, 230), -1)
+            cv2.putText(frame, f"FRAME {i}", (50, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+            frames.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+        return frames
+    
+    def current_frame(self):
+        """Get the frame that is 'live' right now"""
+        index = int((time.time() - self.start_time) * self.fps) % len(self.frames)
+        return self.frames[index]
+
+# ================= REPLAY SERVER =================
+class FaultSettings:
+    """Latency, jitter and failure injection settings"""
+    def __init__(self, latency=0.0, jitter=0.0, timeout_rate=0.0, truncate_rate=0.0,
+                 error_rate=0.0, timeout_delay=30.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.timeout_rate = timeout_rate
+        self.truncate_rate = truncate_rate
+        self.error_rate = error_rate
+        self.timeout_delay = timeout_delay
+    
+    def delay(self):
+        """Sleep for the configured latency plus jitter"""
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+    
+    def pick_fault(self):
+        """Pick a fault to inject for one response (or None)"""
+        roll = random.random()
+        if roll < self.timeout_rate:
+            return 'timeout'
+        roll -= self.timeout_rate
+        if roll < self.truncate_rate:
+            return 'truncate'
+        roll -= self.truncate_rate
+        if roll < self.error_rate:
+            return 'error'
+        return None
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive like the IP-webcam app
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        
+        if path == '/shot.jpg':
+            self.send_shot(server)
+        elif path in ('/video', '/videofeed', '/mjpegfeed'):
+            self.send_stream(server)
+        else:
+            self.send_error(404)
+    
+    def send_shot(self, server):
+        """Serve one JPEG snapshot"""
+        faults = server.faults
+        faults.delay()
+        fault = faults.pick_fault()
+        server.count(fault)
+        
+        if fault == 'timeout':
+            time.sleep(faults.timeout_delay)
+            self.close_connection = True
+            return
+        
+        if fault == 'error':
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        data = server.source.current_frame()
+        if fault == 'truncate':
+            data = data[:len(data) // 2]
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def send_stream(self, server):
+        """Serve a multipart MJPEG stream"""
+        faults = server.faults
+        boundary = 'replayframe'
+        
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={boundary}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True
+        
+        interval = 1.0 / server.source.fps
+        next_time = time.time()
+        
+        try:
+            while not server.stopping:
+                next_time += interval
+                faults.delay()
+                fault = faults.pick_fault()
+                server.count(fault)
+                
+                if fault in ('timeout', 'error'):
+                    if fault == 'timeout':
+                        time.sleep(faults.timeout_delay)
+                    return  # Drop the stream
+                
+                data = server.source.current_frame()
+                if fault == 'truncate':
+                    data = data[:len(data) // 2]
+                
+                self.wfile.write(
+                    f"--{boundary}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data + b"\r\n"
+                )
+                
+                delay = next_time - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.time()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Local stand-in for the phone camera"""
+    daemon_threads = True
+    
+    def __init__(self, host, port, source, faults):
+        super().__init__((host, port), ReplayHandler)
+        self.source = source
+        self.faults = faults
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.responses = 0
+        self.injected = {'timeout': 0, 'truncate': 0, 'error': 0}
+    
+    def count(self, fault):
+        """Count one response and any injected fault"""
+        with self.lock:
+            self.responses += 1
+            if fault:
+                self.injected[fault] += 1
+    
+    def total_injected(self):
+        """Total faults injected so far"""
+        with self.lock:
+            return sum(self.injected.values())
+    
+    def start(self):
+        """Serve on a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+    
+    def stop(self):
+        """Stop serving"""
+        self.stopping = True
+        self.shutdown()
+        self.server_close()
+
+# ================= LOAD GENERATOR =================
+def latency_report(name, latencies, failures, duration, faults=None):
+    """Print sustained frames/sec and tail latency (faults = responses the server sabotaged)"""
+    print("\n" + "=" * 60)
+    print(f"{name} RESULTS")
+    print("=" * 60)
+    
+    frames = len(latencies)
+    print(f"Frames:      {frames} ({failures} failed)")
+    if faults is not None:
+        print(f"Faults:      {faults} injected by the server")
+    print(f"Duration:    {duration:.1f}s")
+    print(f"Throughput:  {frames / duration:.1f} frames/sec")
+    
+    if frames:
+        ms = np.array(latencies) * 1000
+        print(f"Latency:     p50={np.percentile(ms, 50):.1f}ms  p95={np.percentile(ms, 95):.1f}ms  "
+              f"p99={np.percentile(ms, 99):.1f}ms  max={ms.max():.1f}ms")
+    
+    print("=" * 60)
+
+
+def bench_camera(config, duration, server=None):
+    """Drive CameraManager as fast as it will go"""
+    from exammode import CameraManager
+    
+    camera = CameraManager(config)
+    latencies = []
+    failures = 0
+    injected = server.total_injected() if server else 0
+    
+    start = time.time()
+    while time.time() - start < duration:
+        t0 = time.time()
+        frame = camera.get_dual_frame(max_retries=1)
+        if frame is None:
+            failures += 1
+        else:
+            latencies.append(time.time() - t0)
+    elapsed = time.time() - start
+    
+    latency_report(f"CAMERA ({config.CAPTURE_MODE})", latencies, failures, elapsed,
+                   server.total_injected() - injected if server else None)
+    
+    stats = camera.session.get_stats()
+    print(f"Connections: {stats['new_connections']} new, {stats['reused_connections']} reused")
+    if camera.stream is not None:
+        stream_stats = camera.stream.get_stats()
+        print(f"Stream:      {stream_stats['frames']} frames, {stream_stats['dropped_frames']} dropped")
+    camera.close()
+
+
+def bench_exam(config, duration, server=None):
+    """Run the full exam monitoring loop unthrottled"""
+    from exammode import CameraManager, SimpleFaceDatabase, ExamMode
+    
+    config.EXAM_VIDEO_FPS = 1000  # Remove the frame-rate cap
+    camera = CameraManager(config)
+    exam = ExamMode(camera, SimpleFaceDatabase(), config)
+    injected = server.total_injected() if server else 0
+    
+    exam.start_exam()
+    start = time.time()
+    time.sleep(duration)
+    exam.exam_active = False
+    exam.exam_thread.join(timeout=10)
+    exam.stop_recording(save=False)
+    elapsed = time.time() - start
+    
+    # Failed camera attempts come from the supervisor, injected faults from the server
+    latency_report("EXAM LOOP", list(exam.frame_latencies), camera.supervisor.total_failures, elapsed,
+                   server.total_injected() - injected if server else None)
+    camera.close()
+
+def bench_detector(config, source, workers):
+    """Compare sequential and parallel cascade execution on the source frames"""
+    from exammode import FaceDetector, DualFrame, DETECTION_POOL
+    
+    frames = [DualFrame(data, config.EXAM_DETECTION_SCALE).gray for data in source.frames]
+    print(f"\nDetector benchmark: {len(frames)} frames at 1/{config.EXAM_DETECTION_SCALE} scale, "
+          f"{os.cpu_count()} CPUs")
+    
+    results = {}
+    for count in (0, workers):
+        config.CASCADE_WORKERS = count
+        for mode in ('all', 'adaptive'):
+            config.FACE_DETECTION_MODE = mode
+            detector = FaceDetector(config)
+            detector.detect_faces_opencv(frames[0])  # Load cascades and warm up
+            
+            latencies = []
+            found = 0
+            for gray in frames:
+                t0 = time.time()
+                found += len(detector.detect_faces_opencv(gray)[0])
+                latencies.append(time.time() - t0)
+            
+            results[(count, mode)] = np.mean(latencies) * 1000
+            print(f"  workers={count:<3} mode={mode:<9} {results[(count, mode)]:7.1f} ms/frame  "
+                  f"p95={np.percentile(latencies, 95) * 1000:.1f}ms  faces/frame={found / len(frames):.1f}")
+    
+    for mode in ('all', 'adaptive'):
+        print(f"  speedup ({mode}): {results[(0, mode)] / results[(workers, mode)]:.2f}x with {workers} workers")
+    
+    DETECTION_POOL.shutdown()
+
+# ================= MAIN PROGRAM =================
+def build_server(args):
+    """Create the replay server from command-line arguments"""
+    source = ReplaySource.from_path(args.source, fps=args.fps, max_frames=args.max_frames)
+    faults = FaultSettings(
+        latency=args.latency / 1000.0,
+        jitter=args.jitter / 1000.0,
+        timeout_rate=args.timeout_rate,
+        truncate_rate=args.truncate_rate,
+        error_rate=args.error_rate,
+        timeout_delay=args.timeout_delay
+    )
+    return ReplayServer(args.host, args.port, source, faults)
+
+
+def main():
+    """Main program"""
+    parser = argparse.ArgumentParser(description="Camera replay server and load generator")
+    parser.add_argument('command', choices=['serve', 'bench'])
+    parser.add_argument('--source', default='', help="Directory of JPEGs or a video file (default: synthetic)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--fps', type=float, default=10)
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0, help="Added latency in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="Latency jitter in ms (+/-)")
+    parser.add_argument('--timeout-rate', type=float, default=0, help="Fraction of responses that hang")
+    parser.add_argument('--truncate-rate', type=float, default=0, help="Fraction of truncated JPEGs")
+    parser.add_argument('--error-rate', type=float, default=0, help="Fraction of 503 responses")
+    parser.add_argument('--timeout-delay', type=float, default=30, help="Seconds a hung response waits")
+    parser.add_argument('--target', choices=['camera', 'exam', 'both', 'detector'], default='both')
+    parser.add_argument('--capture', choices=['snapshot', 'stream'], default='snapshot')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=4, help="Cascade worker threads for the detector bench")
+    args = parser.parse_args()
+    
+    if args.command == 'serve':
+        server = build_server(args)
+        print(f"Replay server on http://{args.host}:{args.port} "
+              f"({len(server.source.frames)} frames at {args.fps} FPS)")
+        print("Endpoints: /shot.jpg, /video - Ctrl+C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(f"\nServed {server.responses} responses, injected faults: {server.injected}")
+        return
+    
+    from exammode import Config
+    
+    if args.target == 'detector':
+        config = Config()
+        config.DEBUG = False
+        bench_detector(config, ReplaySource.from_path(args.source, max_frames=args.max_frames), args.workers)
+        return
+    
+    # Bench against an embedded server on a free port
+    if args.port == 8080:
+        with socket.socket() as s:
+            s.bind((args.host, 0))
+            args.port = s.getsockname()[1]
+    
+    server = build_server(args)
+    server.start()
+    print(f"Replay server on http://{args.host}:{args.port}")
+    
+    config = Config()
+    config.PHONE_IP = args.host
+    config.PHONE_PORT = str(args.port)
+    config.CAPTURE_MODE = args.capture
+    config.DEBUG = False
+    config.CONNECTION_TIMEOUT = min(config.CONNECTION_TIMEOUT, args.timeout_delay)
+    
+    try:
+        if args.target in ('camera', 'both'):
+            bench_camera(config, args.duration, server)
+        if args.target in ('exam', 'both'):
+            bench_exam(config, args.duration, server)
+    finally:
+        server.stop()
+    
+    print(f"\nServer: {server.responses} responses, injected faults: {server.injected}")
+
+if __name__ == "__main__":
+    main()
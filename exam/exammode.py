@@ -8,18 +8,33 @@ import numpy as np
 import json
 import time
 import threading
-import urllib.request
-import socket
+import http.client
 from datetime import datetime
 import os
 import sys
 import pickle
 import queue
+import asyncio
+import random
+import copy
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 # ================= CONFIGURATION =================
 class Config:
+    # Named speed/accuracy trade-offs; 'scale' overrides exam_detection_scale when present
+    BUILTIN_PROFILES = {
+        'fast': {'cascades': ['face_alt2'], 'scale_factor': 1.2, 'min_neighbors': 4, 'scale': 2},
+        'balanced': {'cascades': ['face_alt2', 'face_alt', 'face_frontal', 'face_profile'],
+                     'scale_factor': 1.1, 'min_neighbors': 5},
+        'accurate': {'cascades': ['face_alt2', 'face_alt', 'face_frontal', 'face_profile'],
+                     'scale_factor': 1.05, 'min_neighbors': 5, 'scale': 1},
+    }
+    
     def __init__(self):
         self.load_config()
+        self.BASE_DETECTION_SCALE = self.EXAM_DETECTION_SCALE
+        self.apply_profile(self.DETECTION_PROFILE)
         self.setup_directories()
         
     def load_config(self):
@@ -37,6 +52,15 @@ class Config:
             self.DETECTION_METHOD = config.get('detection_method', 'single_frame')
             self.ADMIN_AUTO_INTERVAL = config.get('admin_auto_interval', 10)
             self.MIN_FACE_CONFIDENCE = config.get('min_face_confidence', 20)
+            self.CAMERA_POOL_SIZE = config.get('camera_pool_size', 2)  # Keep-alive connections per camera
+            self.CAMERA_FAILURE_THRESHOLD = config.get('camera_failure_threshold', 3)  # Failures before circuit opens
+            self.CAMERA_MAX_BACKOFF = config.get('camera_max_backoff', 30)  # Seconds
+            self.CAPTURE_MODE = config.get('capture_mode', 'snapshot')  # 'snapshot' or 'stream'
+            self.STREAM_PATH = config.get('stream_path', '/video')  # MJPEG endpoint
+            self.SKIP_UNCHANGED_FRAMES = config.get('skip_unchanged_frames', True)
+            self.UNCHANGED_FRAME_THRESHOLD = config.get('unchanged_frame_threshold', 2.0)  # Largest thumbnail block difference
+            self.CAMERAS = config.get('cameras', [])  # Extra room cameras for hall monitoring
+            self.CAPTURE_MAX_CONCURRENCY = config.get('capture_max_concurrency', 16)
             
             # Exam mode settings
             self.EXAM_MOTION_THRESHOLD = config.get('exam_motion_threshold', 500)
@@ -46,6 +70,27 @@ class Config:
             self.EXAM_CHECK_INTERVAL = config.get('exam_check_interval', 0.5)  # Faster checks
             self.EXAM_VIDEO_FPS = config.get('exam_video_fps', 10)  # FPS for recording
             self.EXAM_PRE_EVENT_BUFFER = config.get('exam_pre_event_buffer', 3)  # Save 3 seconds before event
+            self.EXAM_DETECTION_SCALE = config.get('exam_detection_scale', 2)  # Detect on 1/2, 1/4 or 1/8 size
+            self.FACE_DETECTION_MODE = config.get('face_detection_mode', 'adaptive')  # 'adaptive' or 'all'
+            self.CASCADE_MAX_INSTANCES = config.get('cascade_max_instances', 4)  # Per-cascade classifiers for concurrent rooms
+            self.CASCADE_WORKERS = config.get('cascade_workers', 0)  # Threads for parallel cascades, 0 = sequential
+            self.ADAPTIVE_FULL_PASS_INTERVAL = config.get('adaptive_full_pass_interval', 30)  # Frames
+            self.FACE_MERGE_RULE = config.get('face_merge_rule', 'first')  # 'first', 'largest', 'average' or 'weighted'
+            self.FACE_OVERLAP_METRIC = config.get('face_overlap_metric', 'min_area')  # 'min_area' or 'iou'
+            self.FACE_OVERLAP_THRESHOLD = config.get('face_overlap_threshold', 0.5)
+            self.FACE_TRACKING = config.get('face_tracking', True)  # Track faces between full detections
+            self.DETECTION_INTERVAL = config.get('detection_interval', 10)  # Frames between full detections
+            self.TRACKER_MIN_CONFIDENCE = config.get('tracker_min_confidence', 0.5)  # Re-detect below this
+            self.ROI_DETECTION = config.get('roi_detection', True)  # Scan only around motion and known faces
+            self.ROI_PADDING = config.get('roi_padding', 60)  # Pixels added around each region (full resolution)
+            self.ROI_FULL_SWEEP_INTERVAL = config.get('roi_full_sweep_interval', 5.0)  # Seconds between full-frame scans
+            self.TILED_DETECTION = config.get('tiled_detection', False)  # Detect per tile using detection_tiles bands
+            self.DETECTION_TILES = config.get('detection_tiles', [])  # Horizontal bands: top, bottom, scale, columns
+            self.TILE_OVERLAP = config.get('tile_overlap', 0.15)  # Fraction of a tile's width shared with neighbours
+            self.USE_CALIBRATION = config.get('use_calibration', True)  # Apply per-room calibration when saved
+            self.CALIBRATION_DURATION = config.get('calibration_duration', 30)  # Seconds of sampling
+            self.DETECTION_PROFILE = config.get('detection_profile', 'balanced')  # 'fast', 'balanced' or 'accurate'
+            self.DETECTION_PROFILES = dict(self.BUILTIN_PROFILES, **config.get('detection_profiles', {}))
             
             print("Configuration loaded successfully")
             
@@ -64,6 +109,15 @@ class Config:
         self.DETECTION_METHOD = 'single_frame'
         self.ADMIN_AUTO_INTERVAL = 10
         self.MIN_FACE_CONFIDENCE = 20
+        self.CAMERA_POOL_SIZE = 2
+        self.CAMERA_FAILURE_THRESHOLD = 3
+        self.CAMERA_MAX_BACKOFF = 30
+        self.CAPTURE_MODE = 'snapshot'
+        self.STREAM_PATH = '/video'
+        self.SKIP_UNCHANGED_FRAMES = True
+        self.UNCHANGED_FRAME_THRESHOLD = 2.0
+        self.CAMERAS = []
+        self.CAPTURE_MAX_CONCURRENCY = 16
         
         # Exam mode defaults
         self.EXAM_MOTION_THRESHOLD = 500
@@ -73,6 +127,40 @@ class Config:
         self.EXAM_CHECK_INTERVAL = 0.5
         self.EXAM_VIDEO_FPS = 10
         self.EXAM_PRE_EVENT_BUFFER = 3
+        self.EXAM_DETECTION_SCALE = 2
+        self.FACE_DETECTION_MODE = 'adaptive'
+        self.CASCADE_MAX_INSTANCES = 4
+        self.CASCADE_WORKERS = 0
+        self.ADAPTIVE_FULL_PASS_INTERVAL = 30
+        self.FACE_MERGE_RULE = 'first'
+        self.FACE_OVERLAP_METRIC = 'min_area'
+        self.FACE_OVERLAP_THRESHOLD = 0.5
+        self.FACE_TRACKING = True
+        self.DETECTION_INTERVAL = 10
+        self.TRACKER_MIN_CONFIDENCE = 0.5
+        self.ROI_DETECTION = True
+        self.ROI_PADDING = 60
+        self.ROI_FULL_SWEEP_INTERVAL = 5.0
+        self.TILED_DETECTION = False
+        self.DETECTION_TILES = []
+        self.TILE_OVERLAP = 0.15
+        self.USE_CALIBRATION = True
+        self.CALIBRATION_DURATION = 30
+        self.DETECTION_PROFILE = 'balanced'
+        self.DETECTION_PROFILES = dict(self.BUILTIN_PROFILES)
+        
+    def apply_profile(self, name):
+        """Set cascade set, scale step and input resolution from a named profile"""
+        if name not in self.DETECTION_PROFILES:
+            print(f"Unknown detection profile '{name}', using 'balanced'")
+            name = 'balanced'
+        
+        profile = self.DETECTION_PROFILES[name]
+        self.DETECTION_PROFILE = name
+        self.FACE_CASCADES = profile.get('cascades', list(self.BUILTIN_PROFILES['balanced']['cascades']))
+        self.SCALE_FACTOR = profile.get('scale_factor', 1.1)
+        self.MIN_NEIGHBORS = profile.get('min_neighbors', 5)
+        self.EXAM_DETECTION_SCALE = profile.get('scale', self.BASE_DETECTION_SCALE)
         
     def setup_directories(self):
         for dir_name in ['logs', 'debug', 'faces', 'admin_faces', 'database', 
@@ -124,102 +212,1001 @@ class SimpleFaceDatabase:
         print(f"✓ Saved face image: {filename}")
         return True
 
+# ================= DUAL-RESOLUTION FRAME =================
+class DualFrame:
+    """JPEG frame with a reduced grayscale view for detection and a lazy full-colour view"""
+    GRAYSCALE_FLAGS = {
+        1: cv2.IMREAD_GRAYSCALE,
+        2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+        4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+        8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    }
+    COLOR_FLAGS = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }
+    
+    def __init__(self, jpeg_data, scale=1):
+        self.jpeg_data = jpeg_data
+        self.scale = scale if scale in self.GRAYSCALE_FLAGS else 1
+        self._gray = None
+        self._small_color = None
+        self._color = None
+        self._grays = {}
+    
+    def decode(self, flags):
+        """Decode the JPEG and rotate portrait frames to landscape"""
+        image = cv2.imdecode(np.frombuffer(self.jpeg_data, dtype=np.uint8), flags)
+        
+        if image is not None:
+            height, width = image.shape[:2]
+            if height > width:
+                image = cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+        
+        return image
+    
+    @property
+    def gray(self):
+        """Reduced-resolution grayscale view for detection and motion"""
+        if self._gray is None:
+            self._gray = self.decode(self.GRAYSCALE_FLAGS[self.scale])
+        return self._gray
+    
+    def gray_at(self, scale):
+        """Grayscale view at any supported reduction, decoded once per scale"""
+        if scale == self.scale:
+            return self.gray
+        if scale not in self._grays:
+            self._grays[scale] = self.decode(self.GRAYSCALE_FLAGS.get(scale, cv2.IMREAD_GRAYSCALE))
+        return self._grays[scale]
+    
+    @property
+    def small_color(self):
+        """Reduced-resolution colour view for colour-based detectors"""
+        if self._small_color is None:
+            if self._color is not None and self.scale == 1:
+                self._small_color = self._color
+            else:
+                self._small_color = self.decode(self.COLOR_FLAGS[self.scale])
+        return self._small_color
+    
+    @property
+    def color(self):
+        """Full-resolution colour view, decoded on first use"""
+        if self._color is None:
+            self._color = self.decode(cv2.IMREAD_COLOR)
+        return self._color
+    
+    def to_full(self, boxes):
+        """Map boxes from the reduced view back to full-resolution coordinates"""
+        s = self.scale
+        return [(int(x) * s, int(y) * s, int(w) * s, int(h) * s) for (x, y, w, h) in boxes]
+    
+    def to_reduced(self, boxes):
+        """Map full-resolution boxes onto the reduced view"""
+        s = self.scale
+        return [(int(x) // s, int(y) // s, int(w) // s, int(h) // s) for (x, y, w, h) in boxes]
+
+# ================= FRAME FINGERPRINT =================
+class FrameFingerprint:
+    """Detects unchanged frames with a JPEG hash and a tiny thumbnail"""
+    def __init__(self, threshold=2.0, size=(64, 48), block=4):
+        self.threshold = threshold  # Largest per-block mean absolute difference (0-255)
+        self.size = size
+        self.block = block  # Thumbnail pixels per block side
+        self.reference_hash = None
+        self.reference_thumb = None
+        self.checks = 0
+        self.unchanged = 0
+    
+    def thumbnail(self, image):
+        """Shrink a frame to a tiny grayscale thumbnail"""
+        if image.ndim == 3:
+            image = cv2.cvtColor(cv2.resize(image, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        else:
+            image = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+        return image.astype(np.int16)
+    
+    def is_unchanged(self, image, jpeg_data=None):
+        """Check if a frame matches the last analysed one (if not, it becomes the new reference)"""
+        self.checks += 1
+        
+        frame_hash = hash(jpeg_data) if jpeg_data is not None else None
+        if frame_hash is not None and frame_hash == self.reference_hash:
+            self.unchanged += 1
+            return True
+        
+        thumb = self.thumbnail(image)
+        if self.reference_thumb is not None and thumb.shape == self.reference_thumb.shape:
+            if self.difference(thumb, self.reference_thumb) < self.threshold:
+                self.unchanged += 1
+                return True
+        
+        self.reference_hash = frame_hash
+        self.reference_thumb = thumb
+        return False
+    
+    def difference(self, thumb, reference):
+        """Largest mean absolute difference over the thumbnail's blocks"""
+        # A whole-frame mean hides a small moving object, a per-block mean does not
+        b = self.block
+        h, w = (thumb.shape[0] // b) * b, (thumb.shape[1] // b) * b
+        delta = np.abs(thumb[:h, :w] - reference[:h, :w])
+        return delta.reshape(h // b, b, w // b, b).mean(axis=(1, 3)).max()
+    
+    def reset(self):
+        """Forget the reference frame"""
+        self.reference_hash = None
+        self.reference_thumb = None
+    
+    def get_stats(self):
+        """Get reuse statistics"""
+        return {
+            'checks': self.checks,
+            'reused': self.unchanged,
+            'reuse_rate': self.unchanged / self.checks if self.checks else 0.0
+        }
+
+# ================= CASCADE REGISTRY =================
+class CascadeRegistry:
+    """Process-wide cache of Haar cascades, loaded lazily and shared by every detector"""
+    PATHS = {
+        'face_frontal': 'haarcascade_frontalface_default.xml',
+        'face_profile': 'haarcascade_profileface.xml',
+        'face_alt': 'haarcascade_frontalface_alt.xml',
+        'face_alt2': 'haarcascade_frontalface_alt2.xml',
+    }
+    
+    def __init__(self, max_instances=4):
+        # detectMultiScale is not safe to call concurrently on one classifier,
+        # so each cascade keeps a small pool that only grows under contention
+        self.max_instances = max_instances
+        self.condition = threading.Condition()
+        self.entries = {}
+    
+    def load(self, name):
+        """Parse one cascade file, returning (classifier, seconds) or (None, seconds)"""
+        start = time.time()
+        cascade = cv2.CascadeClassifier()
+        loaded = cascade.load(cv2.data.haarcascades + self.PATHS[name])
+        return (cascade if loaded else None), time.time() - start
+    
+    def ensure(self, names):
+        """Load any cascades not yet cached and return the names that are available"""
+        available = []
+        
+        for name in names:
+            with self.condition:
+                entry = self.entries.get(name)
+                
+                if entry is None:
+                    cascade, elapsed = self.load(name)
+                    entry = {
+                        'available': cascade is not None,
+                        'idle': [cascade] if cascade is not None else [],
+                        'instances': 1 if cascade is not None else 0,
+                        'load_time': elapsed,
+                        'uses': 0,
+                        'waits': 0,
+                    }
+                    self.entries[name] = entry
+                    status = "✓" if entry['available'] else "✗"
+                    print(f"  {status} {name} ({elapsed * 1000:.0f}ms)")
+            
+            if entry['available']:
+                available.append(name)
+        
+        return available
+    
+    def acquire(self, name):
+        """Borrow a classifier, loading an extra instance if all are busy"""
+        with self.condition:
+            entry = self.entries[name]
+            entry['uses'] += 1
+            
+            while True:
+                if entry['idle']:
+                    return entry['idle'].pop()
+                if entry['instances'] < self.max_instances:
+                    entry['instances'] += 1
+                    break
+                entry['waits'] += 1
+                self.condition.wait()
+        
+        # Extra instances are parsed outside the lock so other cascades stay usable
+        cascade, elapsed = self.load(name)
+        with self.condition:
+            entry['load_time'] += elapsed
+            if cascade is None:
+                entry['instances'] -= 1
+        
+        if cascade is None:
+            raise RuntimeError(f"could not load another {name} classifier")
+        return cascade
+    
+    def release(self, name, cascade):
+        """Return a borrowed classifier to the pool"""
+        with self.condition:
+            self.entries[name]['idle'].append(cascade)
+            self.condition.notify()
+    
+    def detect(self, name, gray, **kwargs):
+        """Run detectMultiScale on a pooled classifier"""
+        cascade = self.acquire(name)
+        try:
+            return cascade.detectMultiScale(gray, **kwargs)
+        finally:
+            self.release(name, cascade)
+    
+    def status_lines(self):
+        """Format load times and pool usage for status output"""
+        with self.condition:
+            loaded = [(name, dict(entry)) for name, entry in self.entries.items() if entry['available']]
+        
+        if not loaded:
+            return ["no cascades loaded yet"]
+        
+        total = sum(entry['load_time'] for _, entry in loaded)
+        lines = [f"{len(loaded)} shared process-wide, {total * 1000:.0f}ms total load time"]
+        for name, entry in loaded:
+            lines.append(f"{name:<13} instances={entry['instances']} uses={entry['uses']} "
+                         f"waits={entry['waits']} load={entry['load_time'] * 1000:.0f}ms")
+        return lines
+
+
+CASCADES = CascadeRegistry()
+
+
+class DetectionPool:
+    """Persistent worker threads shared by every detector (detectMultiScale releases the GIL)"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.workers = 0
+    
+    def get_executor(self, workers):
+        """Create the executor on first use, or resize it if the worker count changed"""
+        with self.lock:
+            if self.executor is None or self.workers != workers:
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False)
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detect')
+                self.workers = workers
+            return self.executor
+    
+    def map(self, function, items, workers):
+        """Apply function to every item, in parallel when workers > 1"""
+        items = list(items)
+        if workers <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+        return list(self.get_executor(workers).map(function, items))
+    
+    def shutdown(self):
+        """Stop the worker threads"""
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+
+
+DETECTION_POOL = DetectionPool()
+
 # ================= FACE DETECTOR (FIXED LBP ERROR) =================
 class FaceDetector:
+    # Relative trust in each cascade when merging with the 'weighted' rule
+    CASCADE_WEIGHTS = {
+        'face_alt2': 1.0,
+        'face_alt': 0.9,
+        'face_frontal': 0.8,
+        'face_profile': 0.6,
+    }
+    
     def __init__(self, config):
         self.config = config
         self.DEBUG = config.DEBUG
         
-        # Load Haar cascades only (no LBP)
-        self.cascades = self.load_cascades()
-        print(f"Loaded {len(self.cascades)} face detection cascades")
+        # Haar cascades only (no LBP), loaded from the shared registry on first use
+        self.loaded_cascades = None
+        
+        # Per-cascade statistics drive the adaptive ordering (updated from pool workers)
+        self.cascade_stats = {}
+        self.stats_lock = threading.Lock()
+        self.tracked_count = 0
+        self.adaptive_frames = 0
+        self.cascades_skipped = 0
+        self.escalations = 0
+        self.pixels_scanned = 0
+        self.pixels_total = 0
+        
+        # Full-resolution (min, max) face size from room calibration
+        self.size_bounds = None
+    
+    @property
+    def cascades(self):
+        """Names of the available cascades, loading them from the registry on first access"""
+        if self.loaded_cascades is None:
+            names = CASCADES.ensure(self.config.FACE_CASCADES)
+            self.cascade_stats = {
+                name: {'runs': 0, 'time': 0.0, 'detections': 0, 'scored_time': 0.0, 'scored_detections': 0}
+                for name in names
+            }
+            self.loaded_cascades = names
+        return self.loaded_cascades
+    
+    def detect_faces_dual(self, dual, motion_boxes=None, rois=None):
+        """Detect faces on the reduced grayscale view; returns (full-resolution boxes, confidences)"""
+        if dual is None or dual.gray is None:
+            return [], []
+        
+        min_size, max_size = self.size_limits(30, dual.scale)
+        faces, confidences = self.detect_faces_opencv(dual.gray, min_size=min_size,
+                                                      motion_boxes=motion_boxes, motion_radius=150 // dual.scale,
+                                                      rois=rois, max_size=max_size)
+        return dual.to_full(faces), confidences
+    
+    def size_limits(self, min_side, scale):
+        """minSize/maxSize for a view at the given scale, narrowed by calibration"""
+        max_size = None
+        if self.size_bounds is not None:
+            min_side = max(min_side, self.size_bounds[0])
+            max_side = max(1, self.size_bounds[1] // scale)
+            max_size = (max_side, max_side)
+        
+        min_side = max(1, min_side // scale)
+        return (min_side, min_side), max_size
     
-    def load_cascades(self):
-        """Load Haar cascade classifiers only"""
-        cascades = {}
+    def survey_faces(self, dual, min_side=20):
+        """Run every cascade over the whole frame with the widest size range (for calibration)"""
+        gray = dual.gray_at(1) if dual is not None else None
+        if gray is None:
+            return []
         
-        cascade_paths = {
-            'face_frontal': cv2.data.haarcascades + 'haarcascade_frontalface_default.xml',
-            'face_profile': cv2.data.haarcascades + 'haarcascade_profileface.xml',
-            'face_alt': cv2.data.haarcascades + 'haarcascade_frontalface_alt.xml',
-            'face_alt2': cv2.data.haarcascades + 'haarcascade_frontalface_alt2.xml',
-        }
+        gray = cv2.equalizeHist(gray)
+        all_faces = []
+        all_sources = []
         
-        for name, path in cascade_paths.items():
-            cascade = cv2.CascadeClassifier()
-            if cascade.load(path):
-                cascades[name] = cascade
-                print(f"  ✓ {name}")
+        results = self.run_cascades(self.cascades, gray, (min_side, min_side), record=False)
+        for cascade_name, faces in zip(self.cascades, results):
+            all_faces.extend(faces)
+            all_sources.extend([cascade_name] * len(faces))
+        
+        faces, _ = self.merge_faces(all_faces, all_sources, len(self.cascades))
+        return faces
+    
+    def build_tiles(self, width, height):
+        """Split a full-resolution frame into overlapping tiles from the configured bands"""
+        tiles = []
+        
+        for band in self.config.DETECTION_TILES:
+            scale = band.get('scale', 1)
+            if scale not in DualFrame.GRAYSCALE_FLAGS:
+                scale = 1
+            
+            top = int(band.get('top', 0.0) * height)
+            bottom = int(band.get('bottom', 1.0) * height)
+            columns = max(1, int(band.get('columns', 1)))
+            step = width / columns
+            pad = int(step * self.config.TILE_OVERLAP / 2)
+            
+            for column in range(columns):
+                x1 = max(0, int(column * step) - pad)
+                x2 = min(width, int((column + 1) * step) + pad)
+                tiles.append({
+                    'rect': (x1, top, x2 - x1, bottom - top),
+                    'scale': scale,
+                    'min_size': band.get('min_size', 30),
+                })
+        
+        return tiles
+    
+    def detect_faces_tiled(self, dual, motion_boxes=None, rois=None):
+        """Detect faces tile by tile at per-band resolution; returns (full-resolution boxes, confidences)"""
+        if dual is None or dual.gray is None:
+            return [], []
+        
+        height, width = dual.gray.shape[0] * dual.scale, dual.gray.shape[1] * dual.scale
+        tiles = self.build_tiles(width, height)
+        if not tiles:
+            return self.detect_faces_dual(dual, dual.to_reduced(motion_boxes or []),
+                                          dual.to_reduced(rois) if rois is not None else None)
+        
+        grays = {}
+        jobs = []
+        
+        for tile in tiles:
+            scale = tile['scale']
+            tx, ty, tw, th = tile['rect']
+            
+            # Only the parts of the tile inside the regions of interest are scanned
+            if rois is None:
+                crops = [tile['rect']]
             else:
-                print(f"  ✗ {name} (not available)")
+                crops = []
+                for rx, ry, rw, rh in rois:
+                    x1, y1 = max(tx, rx), max(ty, ry)
+                    x2, y2 = min(tx + tw, rx + rw), min(ty + th, ry + rh)
+                    if x2 > x1 and y2 > y1:
+                        crops.append((x1, y1, x2 - x1, y2 - y1))
+            
+            if not crops:
+                continue
+            
+            if scale not in grays:
+                grays[scale] = cv2.equalizeHist(dual.gray_at(scale))
+            
+            min_size, max_size = self.size_limits(tile['min_size'], scale)
+            jobs.append({
+                'scale': scale,
+                'crops': [(x // scale, y // scale, w // scale, h // scale) for (x, y, w, h) in crops],
+                'min_size': min_size,
+                'max_size': max_size,
+            })
+            self.pixels_scanned += sum(w * h for (_, _, w, h) in crops)
+        
+        self.pixels_total += width * height
+        
+        # Adaptive mode still runs every cascade every N frames so the ordering keeps learning
+        adaptive = self.config.FACE_DETECTION_MODE == 'adaptive'
+        full_pass = True
+        if adaptive:
+            self.adaptive_frames += 1
+            interval = self.config.ADAPTIVE_FULL_PASS_INTERVAL
+            full_pass = interval <= 1 or self.adaptive_frames % interval == 1
+        
+        order = self.cascade_order() if adaptive else list(self.cascades)
+        batches = [order] if full_pass else [order[:1], order[1:]]
         
-        return cascades
+        all_faces = []
+        all_sources = []
+        faces = []
+        confidences = []
+        cascades_run = 0
+        
+        for i, batch in enumerate(batches):
+            # Every (tile, cascade) pair is an independent job for the worker pool
+            work = [(name, job) for job in jobs for name in batch]
+            results = DETECTION_POOL.map(
+                lambda item: self.run_cascade(item[0], grays[item[1]['scale']], item[1]['min_size'],
+                                              record=full_pass, rois=item[1]['crops'],
+                                              max_size=item[1]['max_size']),
+                work,
+                self.config.CASCADE_WORKERS
+            )
+            
+            for (name, job), found in zip(work, results):
+                s = job['scale']
+                all_faces.extend((x * s, y * s, w * s, h * s) for (x, y, w, h) in found)
+                all_sources.extend([name] * len(found))
+            
+            # Overlapping tiles see the same face twice; the merge removes seam duplicates
+            cascades_run += len(batch)
+            faces, confidences = self.merge_faces(all_faces, all_sources, cascades_run)
+            
+            if full_pass:
+                break
+            
+            if (len(faces) >= self.tracked_count and
+                    not self.has_uncovered_motion(motion_boxes, faces, 150)):
+                self.cascades_skipped += len(order) - cascades_run
+                break
+            
+            if i + 1 < len(batches):
+                self.escalations += 1
+        
+        self.tracked_count = len(faces)
+        return faces, confidences
     
-    def detect_faces_opencv(self, frame):
-        """Detect faces using Haar cascades"""
+    def detect_faces_opencv(self, frame, min_size=(30, 30), motion_boxes=None, motion_radius=150, rois=None,
+                            max_size=None):
+        """Detect faces using Haar cascades, optionally only inside the given regions; returns (boxes, confidences)"""
         if frame is None:
-            return []
+            return [], []
         
         # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Apply histogram equalization for better contrast
         gray = cv2.equalizeHist(gray)
         
+        self.pixels_total += gray.shape[0] * gray.shape[1]
+        self.pixels_scanned += (gray.shape[0] * gray.shape[1] if rois is None
+                                else sum(w * h for (_, _, w, h) in rois))
+        
+        if self.config.FACE_DETECTION_MODE == 'adaptive':
+            return self.detect_adaptive(gray, min_size, motion_boxes, motion_radius, rois, max_size)
+        
         all_faces = []
+        all_sources = []
         
         # Try different cascades
-        for cascade_name, cascade in self.cascades.items():
+        results = self.run_cascades(self.cascades, gray, min_size, rois=rois, max_size=max_size)
+        for cascade_name, faces in zip(self.cascades, results):
+            all_faces.extend(faces)
+            all_sources.extend([cascade_name] * len(faces))
+        
+        return self.merge_faces(all_faces, all_sources, len(self.cascades))
+    
+    def cascade_detect(self, cascade_name, gray, min_size, max_size=None):
+        """Run detectMultiScale with the settings for this cascade"""
+        # maxSize (0, 0) means no upper limit on the pyramid
+        if 'profile' in cascade_name:
+            return CASCADES.detect(
+                cascade_name,
+                gray,
+                scaleFactor=self.config.SCALE_FACTOR,
+                minNeighbors=self.config.MIN_NEIGHBORS,
+                minSize=min_size,
+                maxSize=max_size or (0, 0)
+            )
+        
+        return CASCADES.detect(
+            cascade_name,
+            gray,
+            scaleFactor=self.config.SCALE_FACTOR,
+            minNeighbors=self.config.MIN_NEIGHBORS,
+            minSize=min_size,
+            maxSize=max_size or (0, 0),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+    
+    def run_cascade(self, cascade_name, gray, min_size, record=True, rois=None, max_size=None):
+        """Run one cascade over the frame (or each region) and update its statistics"""
+        start = time.time()
+        
+        try:
+            if rois is None:
+                faces = list(self.cascade_detect(cascade_name, gray, min_size, max_size))
+            else:
+                faces = []
+                for x, y, w, h in rois:
+                    if w < min_size[0] or h < min_size[1]:
+                        continue
+                    crop = gray[y:y + h, x:x + w]
+                    for fx, fy, fw, fh in self.cascade_detect(cascade_name, crop, min_size, max_size):
+                        faces.append((fx + x, fy + y, fw, fh))
+        except Exception as e:
+            if self.DEBUG:
+                print(f"  Cascade {cascade_name} error: {e}")
+            faces = []
+        
+        elapsed = time.time() - start
+        with self.stats_lock:
+            stats = self.cascade_stats[cascade_name]
+            stats['runs'] += 1
+            stats['time'] += elapsed
+            stats['detections'] += len(faces)
+            
+            # Only full passes feed the ordering, so every cascade sees the same frames
+            if record:
+                stats['scored_time'] += elapsed
+                stats['scored_detections'] += len(faces)
+        
+        return list(faces)
+    
+    def run_cascades(self, cascade_names, gray, min_size, record=True, rois=None, max_size=None):
+        """Run several cascades, on the shared worker pool when configured"""
+        return DETECTION_POOL.map(
+            lambda name: self.run_cascade(name, gray, min_size, record=record, rois=rois, max_size=max_size),
+            cascade_names,
+            self.config.CASCADE_WORKERS
+        )
+    
+    def cascade_order(self):
+        """Order cascades by detections per second on full passes, cheapest first on ties"""
+        def score(name):
+            stats = self.cascade_stats[name]
+            rate = stats['scored_detections'] / stats['scored_time'] if stats['scored_time'] else 0.0
+            avg_time = stats['time'] / stats['runs'] if stats['runs'] else 0.0
+            return (-rate, avg_time)
+        
+        names = self.cascades
+        with self.stats_lock:
+            return sorted(names, key=score)
+    
+    def detect_adaptive(self, gray, min_size, motion_boxes, motion_radius, rois=None, max_size=None):
+        """Run the best cascade first and escalate only when faces may be missing"""
+        self.adaptive_frames += 1
+        interval = self.config.ADAPTIVE_FULL_PASS_INTERVAL
+        full_pass = interval <= 1 or self.adaptive_frames % interval == 1
+        
+        order = self.cascade_order()
+        all_faces = []
+        all_sources = []
+        faces = []
+        confidences = []
+        cascades_run = 0
+        
+        # Full passes run everything at once; with workers an escalation runs
+        # all remaining cascades in parallel instead of one at a time
+        if full_pass:
+            batches = [order]
+        elif self.config.CASCADE_WORKERS > 1:
+            batches = [order[:1], order[1:]]
+        else:
+            batches = [[name] for name in order]
+        
+        for i, batch in enumerate(batches):
+            results = self.run_cascades(batch, gray, min_size, record=full_pass, rois=rois, max_size=max_size)
+            for cascade_name, found in zip(batch, results):
+                all_faces.extend(found)
+                all_sources.extend([cascade_name] * len(found))
+            cascades_run += len(batch)
+            faces, confidences = self.merge_faces(all_faces, all_sources, cascades_run)
+            
+            if full_pass:
+                continue
+            
+            # Stop once we have as many faces as we are tracking and all motion is explained
+            if (len(faces) >= self.tracked_count and
+                    not self.has_uncovered_motion(motion_boxes, faces, motion_radius)):
+                self.cascades_skipped += len(order) - cascades_run
+                break
+            
+            if i + 1 < len(batches):
+                self.escalations += 1
+        
+        self.tracked_count = len(faces)
+        return faces, confidences
+    
+    def has_uncovered_motion(self, motion_boxes, faces, radius):
+        """Check for motion regions far from every detected face"""
+        if not motion_boxes:
+            return False
+        
+        for mx, my, mw, mh in motion_boxes:
+            motion_center = (mx + mw // 2, my + mh // 2)
+            covered = False
+            for fx, fy, fw, fh in faces:
+                face_center = (fx + fw // 2, fy + fh // 2)
+                distance = np.sqrt((motion_center[0] - face_center[0])**2 +
+                                   (motion_center[1] - face_center[1])**2)
+                if distance < radius:
+                    covered = True
+                    break
+            
+            if not covered:
+                return True
+        
+        return False
+    
+    def merge_faces(self, all_faces, sources, cascades_run):
+        """Merge overlapping detections (vectorized NMS) and score each face by cascade agreement"""
+        if len(all_faces) == 0:
+            return [], []
+        
+        boxes = np.asarray(all_faces, dtype=np.float32).reshape(-1, 4)
+        weights = np.array([self.CASCADE_WEIGHTS.get(name, 1.0) for name in sources], dtype=np.float32)
+        source_ids = np.unique(np.asarray(sources), return_inverse=True)[1]
+        
+        x1, y1 = boxes[:, 0], boxes[:, 1]
+        x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+        areas = boxes[:, 2] * boxes[:, 3]
+        
+        # Pairwise overlap matrix in one pass
+        iw = np.clip(np.minimum(x2[:, None], x2[None, :]) - np.maximum(x1[:, None], x1[None, :]), 0, None)
+        ih = np.clip(np.minimum(y2[:, None], y2[None, :]) - np.maximum(y1[:, None], y1[None, :]), 0, None)
+        intersection = iw * ih
+        
+        if self.config.FACE_OVERLAP_METRIC == 'iou':
+            overlap = intersection / np.maximum(areas[:, None] + areas[None, :] - intersection, 1e-6)
+        else:
+            overlap = intersection / np.maximum(np.minimum(areas[:, None], areas[None, :]), 1e-6)
+        
+        # Seeds are taken in detection order ('first' keeps the first-seen box, as the
+        # old pairwise loop did), largest first, or highest cascade weight first
+        rule = self.config.FACE_MERGE_RULE
+        if rule == 'weighted':
+            order = np.lexsort((-areas, -weights))
+        elif rule in ('largest', 'average'):
+            order = np.argsort(-areas, kind='stable')
+        else:
+            order = np.arange(len(boxes))
+        
+        # Greedy clustering - each seed absorbs every unassigned box it overlaps
+        adjacent = overlap > self.config.FACE_OVERLAP_THRESHOLD
+        np.fill_diagonal(adjacent, True)
+        labels = np.full(len(boxes), -1)
+        seeds = []
+        
+        for i in order:
+            if labels[i] >= 0:
+                continue
+            labels[adjacent[i] & (labels < 0)] = len(seeds)
+            seeds.append(i)
+        
+        clusters = len(seeds)
+        
+        if rule == 'average':
+            merged = np.stack([np.bincount(labels, weights=boxes[:, k], minlength=clusters)
+                               for k in range(4)], axis=1)
+            merged /= np.bincount(labels, minlength=clusters)[:, None]
+        elif rule == 'weighted':
+            merged = np.stack([np.bincount(labels, weights=boxes[:, k] * weights, minlength=clusters)
+                               for k in range(4)], axis=1)
+            merged /= np.bincount(labels, weights=weights, minlength=clusters)[:, None]
+        else:
+            merged = boxes[seeds]
+        
+        # Confidence = distinct cascades in each cluster / cascades run
+        source_count = source_ids.max() + 1
+        pairs = np.unique(labels * source_count + source_ids)
+        agreement = np.bincount(pairs // source_count, minlength=clusters)
+        
+        faces = [tuple(int(v) for v in box) for box in np.rint(merged)]
+        confidences = (agreement / max(cascades_run, 1)).tolist()
+        
+        return faces, confidences
+    
+    def status_lines(self):
+        """Format per-cascade statistics for status output"""
+        lines = []
+        if self.loaded_cascades is None:
+            return lines
+        
+        for name in self.cascade_order():
+            stats = self.cascade_stats[name]
+            avg_ms = 1000 * stats['time'] / stats['runs'] if stats['runs'] else 0.0
+            lines.append(f"{name:<13} runs={stats['runs']:<6} avg={avg_ms:.1f}ms detections={stats['detections']}")
+        
+        if self.config.CASCADE_WORKERS > 1:
+            lines.append(f"parallel: {self.config.CASCADE_WORKERS} worker threads")
+        
+        if self.pixels_total:
+            lines.append(f"scanned {self.pixels_scanned / self.pixels_total:.1%} of frame pixels")
+        
+        if self.config.FACE_DETECTION_MODE == 'adaptive' and self.adaptive_frames:
+            lines.append(f"adaptive: {self.cascades_skipped} cascade runs skipped, "
+                         f"{self.escalations} escalations over {self.adaptive_frames} frames")
+        
+        return lines
+
+# ================= FACE TRACKER =================
+class FaceTracker:
+    """Carries faces between detection passes with pyramidal Lucas-Kanade optical flow"""
+    def __init__(self, config):
+        self.config = config
+        self.tracks = []
+        self.next_id = 1
+        self.prev_gray = None
+        self.frames_since_detection = 0
+        
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+        )
+        
+        # Statistics
+        self.tracked_frames = 0
+        self.detection_frames = 0
+        self.forced_detections = 0
+        self.tracks_created = 0
+    
+    def reset(self):
+        """Forget every track"""
+        self.tracks = []
+        self.prev_gray = None
+        self.frames_since_detection = 0
+    
+    @property
+    def boxes(self):
+        """Current track boxes in reduced-view coordinates"""
+        return [tuple(int(round(v)) for v in track['box']) for track in self.tracks]
+    
+    @property
+    def track_ids(self):
+        """Stable IDs, in the same order as boxes"""
+        return [track['id'] for track in self.tracks]
+    
+    def detection_due(self):
+        """Check whether the next frame needs a full detection pass"""
+        return self.prev_gray is None or self.frames_since_detection >= self.config.DETECTION_INTERVAL
+    
+    def seed_points(self, gray, box):
+        """Pick corners inside a face box, falling back to a grid on flat faces"""
+        x, y, w, h = [int(round(v)) for v in box]
+        height, width = gray.shape[:2]
+        x0, y0 = max(0, x + w // 6), max(0, y + h // 6)
+        x1, y1 = min(width, x + w - w // 6), min(height, y + h - h // 6)
+        
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return np.empty((0, 1, 2), dtype=np.float32)
+        
+        mask = np.zeros(gray.shape[:2], dtype=np.uint8)
+        mask[y0:y1, x0:x1] = 255
+        points = cv2.goodFeaturesToTrack(gray, maxCorners=20, qualityLevel=0.01, minDistance=3, mask=mask)
+        
+        if points is None or len(points) < 4:
+            gx, gy = np.meshgrid(np.linspace(x0, x1 - 1, 3), np.linspace(y0, y1 - 1, 3))
+            points = np.stack([gx.ravel(), gy.ravel()], axis=1).reshape(-1, 1, 2)
+        
+        return points.astype(np.float32)
+    
+    def start_track(self, gray, box, track_id=None):
+        """Create a track from a detected box"""
+        points = self.seed_points(gray, box)
+        if track_id is None:
+            track_id = self.next_id
+            self.next_id += 1
+            self.tracks_created += 1
+        
+        return {
+            'id': track_id,
+            'box': [float(v) for v in box],
+            'points': points,
+            'seeded': max(len(points), 1),
+            'confidence': 1.0 if len(points) else 0.0,
+        }
+    
+    def update(self, gray):
+        """Move every track with optical flow; returns False when a re-detection is needed"""
+        self.frames_since_detection += 1
+        
+        if self.prev_gray is None or self.prev_gray.shape != gray.shape:
+            return False
+        
+        if not self.tracks:
+            self.prev_gray = gray
+            self.tracked_frames += 1
+            return True
+        
+        # One LK call for all tracks, forward and backward
+        owners = np.concatenate([np.full(len(t['points']), i) for i, t in enumerate(self.tracks)])
+        p0 = np.concatenate([t['points'] for t in self.tracks]).astype(np.float32)
+        
+        if len(p0) == 0:
+            return False
+        
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, p0, None, **self.lk_params)
+        p0r, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, p1, None, **self.lk_params)
+        
+        forward_backward = np.abs(p0 - p0r).reshape(-1, 2).max(axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (forward_backward < 1.0)
+        
+        confident = True
+        for i, track in enumerate(self.tracks):
+            mine = (owners == i) & good
+            
+            if mine.any():
+                shift = np.median((p1[mine] - p0[mine]).reshape(-1, 2), axis=0)
+                track['box'][0] += float(shift[0])
+                track['box'][1] += float(shift[1])
+                track['points'] = p1[mine].reshape(-1, 1, 2)
+            else:
+                track['points'] = np.empty((0, 1, 2), dtype=np.float32)
+            
+            track['confidence'] = len(track['points']) / track['seeded']
+            if track['confidence'] < self.config.TRACKER_MIN_CONFIDENCE:
+                confident = False
+        
+        self.prev_gray = gray
+        self.tracked_frames += 1
+        return confident
+    
+    def correct(self, gray, detections):
+        """Match a fresh detection pass to the tracks so IDs stay stable"""
+        self.detection_frames += 1
+        
+        boxes = np.asarray(detections, dtype=np.float32).reshape(-1, 4)
+        tracked = np.asarray([t['box'] for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        matched = {}
+        
+        if len(boxes) and len(tracked):
+            ix = np.clip(np.minimum(tracked[:, None, 0] + tracked[:, None, 2], boxes[None, :, 0] + boxes[None, :, 2]) -
+                         np.maximum(tracked[:, None, 0], boxes[None, :, 0]), 0, None)
+            iy = np.clip(np.minimum(tracked[:, None, 1] + tracked[:, None, 3], boxes[None, :, 1] + boxes[None, :, 3]) -
+                         np.maximum(tracked[:, None, 1], boxes[None, :, 1]), 0, None)
+            intersection = ix * iy
+            union = (tracked[:, None, 2] * tracked[:, None, 3] + boxes[None, :, 2] * boxes[None, :, 3]) - intersection
+            iou = intersection / np.maximum(union, 1e-6)
+            
+            # Greedy assignment, best overlap first
+            for flat in np.argsort(-iou, axis=None):
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < 0.3:
+                    break
+                if t not in matched.values() and d not in matched:
+                    matched[d] = t
+        
+        self.tracks = [
+            self.start_track(gray, box, self.tracks[matched[d]]['id'] if d in matched else None)
+            for d, box in enumerate(detections)
+        ]
+        self.prev_gray = gray
+        self.frames_since_detection = 0
+    
+    def status_lines(self):
+        """Format tracking statistics for status output"""
+        total = self.tracked_frames + self.detection_frames
+        if not total:
+            return []
+        
+        return [
+            f"{len(self.tracks)} active tracks, {self.tracks_created} created",
+            f"{self.tracked_frames}/{total} frames tracked only ({self.tracked_frames / total:.0%}), "
+            f"{self.forced_detections} early re-detections"
+        ]
+
+# ================= ROOM CALIBRATION =================
+class RoomCalibration:
+    """Per-room face-size bounds, detection scale and search region learned from sample frames"""
+    CALIBRATION_FILE = "database/calibration.json"
+    HAAR_WINDOW = 20  # Training window of the frontal cascades, in scanned pixels
+    SAVE_LOCK = threading.Lock()  # Rooms calibrated in parallel save into the same file
+    
+    @classmethod
+    def load_all(cls):
+        """Load every saved calibration"""
+        if not os.path.exists(cls.CALIBRATION_FILE):
+            return {}
+        
+        try:
+            with open(cls.CALIBRATION_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading calibration: {e}")
+            return {}
+    
+    @classmethod
+    def load(cls, room):
+        """Load the calibration for one room, or None"""
+        return cls.load_all().get(room or 'default')
+    
+    @classmethod
+    def save(cls, room, settings):
+        """Save one room's calibration, keeping the others"""
+        with cls.SAVE_LOCK:
+            calibrations = cls.load_all()
+            calibrations[room or 'default'] = settings
+            
             try:
-                if 'profile' in cascade_name:
-                    faces = cascade.detectMultiScale(
-                        gray,
-                        scaleFactor=1.1,
-                        minNeighbors=5,
-                        minSize=(30, 30)
-                    )
-                else:
-                    faces = cascade.detectMultiScale(
-                        gray,
-                        scaleFactor=1.1,
-                        minNeighbors=5,
-                        minSize=(30, 30),
-                        flags=cv2.CASCADE_SCALE_IMAGE
-                    )
-                
-                if len(faces) > 0:
-                    all_faces.extend(faces)
-                    
+                os.makedirs(os.path.dirname(cls.CALIBRATION_FILE), exist_ok=True)
+                temp_file = f"{cls.CALIBRATION_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(calibrations, f, indent=2)
+                os.replace(temp_file, cls.CALIBRATION_FILE)
+                return True
             except Exception as e:
-                if self.DEBUG:
-                    print(f"  Cascade {cascade_name} error: {e}")
-        
-        # Remove duplicate faces
-        if len(all_faces) > 0:
-            filtered_faces = []
-            for (x, y, w, h) in all_faces:
-                overlap = False
-                for (fx, fy, fw, fh) in filtered_faces:
-                    ix1 = max(x, fx)
-                    iy1 = max(y, fy)
-                    ix2 = min(x + w, fx + fw)
-                    iy2 = min(y + h, fy + fh)
-                    
-                    if ix1 < ix2 and iy1 < iy2:
-                        area1 = w * h
-                        area2 = fw * fh
-                        overlap_area = (ix2 - ix1) * (iy2 - iy1)
-                        
-                        if overlap_area > 0.5 * min(area1, area2):
-                            overlap = True
-                            break
-                
-                if not overlap:
-                    filtered_faces.append((x, y, w, h))
-            
-            return filtered_faces
+                print(f"Error saving calibration: {e}")
+                return False
+    
+    @classmethod
+    def learn(cls, faces, frame_size, frames):
+        """Derive size bounds, scale and ROI from full-resolution face boxes"""
+        width, height = frame_size
+        boxes = np.asarray(faces, dtype=np.float32).reshape(-1, 4)
+        sizes = np.maximum(boxes[:, 2], boxes[:, 3])
+        
+        # Leave headroom around the observed distribution
+        min_size = max(12, int(np.percentile(sizes, 5) * 0.8))
+        max_size = int(np.percentile(sizes, 95) * 1.3) + 1
+        
+        # Coarsest scale that still leaves the smallest face above the Haar window
+        scale = 1
+        for candidate in (8, 4, 2):
+            if min_size // candidate >= cls.HAAR_WINDOW:
+                scale = candidate
+                break
         
-        return []
+        # Search region: every face seen, padded by the largest face size
+        pad = max_size // 2
+        x1 = max(0, int(boxes[:, 0].min()) - pad)
+        y1 = max(0, int(boxes[:, 1].min()) - pad)
+        x2 = min(width, int((boxes[:, 0] + boxes[:, 2]).max()) + pad)
+        y2 = min(height, int((boxes[:, 1] + boxes[:, 3]).max()) + pad)
+        
+        return {
+            'min_size': min_size,
+            'max_size': max_size,
+            'scale': scale,
+            'roi': [x1, y1, x2 - x1, y2 - y1],
+            'frame_size': [width, height],
+            'faces': len(boxes),
+            'frames': frames,
+            'calibrated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
 
 # ================= FRAME BUFFER FOR VIDEO RECORDING =================
 class FrameBuffer:
@@ -250,8 +1237,9 @@ class FrameBuffer:
 
 # ================= EXAM MODE WITH PROPER VIDEO RECORDING =================
 class ExamMode:
-    def __init__(self, camera, face_db, config):
+    def __init__(self, camera, face_db, config, room=None):
         self.camera = camera
+        self.room = room
         self.face_db = face_db
         self.config = config
         self.face_detector = FaceDetector(config)
@@ -271,9 +1259,27 @@ class ExamMode:
         self.suspicious_events = []
         self.consecutive_alerts = 0
         
+        # Unchanged-frame detection
+        self.fingerprint = FrameFingerprint(config.UNCHANGED_FRAME_THRESHOLD)
+        self.face_tracker = FaceTracker(config)
+        self.last_full_sweep = 0
+        self.full_sweeps = 0
+        self.last_analysis = None
+        
+        # Processing statistics
+        self.frames_processed = 0
+        self.frame_latencies = queue.deque(maxlen=1000)  # Capture + analysis time per frame
+        
         # Paper detector
         self.paper_detector = PaperDetector(config)
         
+        # Learned face sizes and search region for this room
+        self.calibration = None
+        if config.USE_CALIBRATION:
+            settings = RoomCalibration.load(room)
+            if settings:
+                self.apply_calibration(settings)
+        
     def activate(self):
         """Activate exam mode"""
         self.active = True
@@ -320,6 +1326,12 @@ class ExamMode:
         self.frame_buffer.clear()
         self.suspicious_events = []
         self.consecutive_alerts = 0
+        self.frames_processed = 0
+        self.frame_latencies.clear()
+        self.fingerprint = FrameFingerprint(self.config.UNCHANGED_FRAME_THRESHOLD)
+        self.face_tracker.reset()
+        self.last_full_sweep = 0
+        self.last_analysis = None
         
         self.exam_active = True
         self.exam_thread = threading.Thread(target=self.exam_monitoring_loop, daemon=True)
@@ -360,8 +1372,8 @@ class ExamMode:
             try:
                 current_time = time.time()
                 
-                # Get frame
-                frame = self.camera.get_single_frame()
+                # Get frame (colour is only decoded when needed)
+                frame = self.camera.get_dual_frame(scale=self.detection_scale)
                 
                 if frame is None:
                     time.sleep(0.5)
@@ -370,10 +1382,24 @@ class ExamMode:
                 frame_count += 1
                 
                 # Store frame in buffer (for pre-event recording)
-                self.frame_buffer.add_frame(frame.copy(), current_time)
+                self.frame_buffer.add_frame(frame, current_time)
+                
+                # Reuse the previous analysis when the scene hasn't changed
+                unchanged = (self.config.SKIP_UNCHANGED_FRAMES and
+                             self.fingerprint.is_unchanged(frame.gray, frame.jpeg_data))
+                reuse = unchanged and self.last_analysis is not None
+                
+                # Motion runs on every frame - it is cheap and catches movements too small
+                # to change the fingerprint, and tells the detector where faces may be missing
+                motion_boxes = self.compute_motion(frame)
                 
-                # Detect faces
-                faces = self.face_detector.detect_faces_opencv(frame)
+                if reuse:
+                    faces = self.last_analysis['faces']
+                    confidences = self.last_analysis['confidences']
+                else:
+                    # Track between detection passes, detect on the reduced view when due
+                    faces, confidences = self.track_or_detect(frame, motion_boxes)
+                    self.last_analysis = {'faces': faces, 'confidences': confidences, 'paper': None}
                 
                 # Detect suspicious activities
                 suspicious_activity = False
@@ -385,7 +1411,9 @@ class ExamMode:
                 
                 # 1. Paper passing detection
                 if len(faces) >= 2:
-                    paper_result = self.detect_paper_passing(frame, faces)
+                    if not reuse or self.last_analysis['paper'] is None:
+                        self.last_analysis['paper'] = self.detect_paper_passing(frame, faces)
+                    paper_result = self.last_analysis['paper']
                     if paper_result['detected']:
                         suspicious_activity = True
                         activity_type = "PAPER_PASSING"
@@ -401,8 +1429,8 @@ class ExamMode:
                         activity_details = communication_result
                         detected_behaviors.append(activity_type)
                 
-                # 3. Unusual movements
-                movement_result = self.detect_unusual_movements(frame, faces)
+                # 3. Unusual movements (checked even when the detection results are reused)
+                movement_result = self.detect_unusual_movements(frame, faces, motion_boxes)
                 if movement_result['detected']:
                     suspicious_activity = True
                     activity_type = "SUSPICIOUS_MOVEMENT"
@@ -429,7 +1457,7 @@ class ExamMode:
                     self.log_suspicious_event(activity_type, activity_details)
                     
                     # Save evidence image with timestamp
-                    self.save_evidence_image(frame, faces, activity_type, activity_details)
+                    self.save_evidence_image(frame.color, faces, activity_type, activity_details, confidences)
                     
                     # If we have multiple consecutive alerts, extend recording
                     if self.consecutive_alerts >= 3:
@@ -438,7 +1466,7 @@ class ExamMode:
                 # Manage recording
                 if self.is_recording:
                     # Add current frame to recording
-                    self.current_video_frames.append(frame.copy())
+                    self.current_video_frames.append(frame)
                     
                     # Check if recording should stop
                     recording_duration = current_time - self.recording_start_time
@@ -450,7 +1478,10 @@ class ExamMode:
                 
                 # Show debug view
                 if self.config.DEBUG and frame_count % 20 == 0:
-                    self.show_debug_view(frame, faces, suspicious_activity, activity_type)
+                    self.show_debug_view(frame.color, faces, suspicious_activity, activity_type, confidences)
+                
+                self.frames_processed += 1
+                self.frame_latencies.append(time.time() - current_time)
                 
                 # Control frame rate
                 elapsed = time.time() - last_frame_time
@@ -466,6 +1497,132 @@ class ExamMode:
         
         print("[EXAM] Exam monitoring loop stopped")
     
+    def track_or_detect(self, frame, motion_boxes):
+        """Carry faces forward with the tracker, detecting only when needed; returns (faces, confidences)"""
+        if not self.config.FACE_TRACKING:
+            return self.detect_faces(frame, motion_boxes)
+        
+        tracker = self.face_tracker
+        
+        if not tracker.detection_due():
+            confident = tracker.update(frame.gray)
+            
+            # New motion away from every tracked face may be someone the tracker doesn't know
+            radius = 150 // frame.scale
+            if confident and not self.face_detector.has_uncovered_motion(motion_boxes, tracker.boxes, radius):
+                return frame.to_full(tracker.boxes), None  # Tracked, not re-scored by the cascades
+            
+            tracker.forced_detections += 1
+        
+        faces, confidences = self.detect_faces(frame, motion_boxes)
+        tracker.correct(frame.gray, frame.to_reduced(faces))
+        return faces, confidences
+    
+    def detect_faces(self, frame, motion_boxes):
+        """Detect faces inside motion/track regions, with a periodic full sweep; returns (faces, confidences)"""
+        rois = None
+        now = time.time()
+        
+        if self.config.ROI_DETECTION and now - self.last_full_sweep < self.config.ROI_FULL_SWEEP_INTERVAL:
+            rois = self.build_rois(frame, motion_boxes)
+        
+        if rois is None:
+            self.last_full_sweep = now
+            self.full_sweeps += 1
+        
+        # Never search outside the calibrated region, even on a full sweep
+        area = self.calibrated_area(frame)
+        if area is not None:
+            rois = [area] if rois is None else self.clip_regions(rois, area)
+        
+        if self.config.TILED_DETECTION:
+            return self.face_detector.detect_faces_tiled(frame, frame.to_full(motion_boxes),
+                                                         frame.to_full(rois) if rois is not None else None)
+        
+        return self.face_detector.detect_faces_dual(frame, motion_boxes, rois)
+    
+    def calibrated_area(self, frame):
+        """Calibrated search region in reduced-view coordinates, or None"""
+        if self.calibration is None:
+            return None
+        
+        # A different camera resolution invalidates the learned region
+        width, height = self.calibration['frame_size']
+        frame_height, frame_width = frame.gray.shape[0] * frame.scale, frame.gray.shape[1] * frame.scale
+        if abs(frame_width - width) > frame.scale or abs(frame_height - height) > frame.scale:
+            return None
+        
+        return tuple(frame.to_reduced([self.calibration['roi']])[0])
+    
+    @staticmethod
+    def clip_regions(rois, area):
+        """Intersect regions with an area, dropping empty ones"""
+        ax, ay, aw, ah = area
+        clipped = []
+        for x, y, w, h in rois:
+            x1, y1 = max(x, ax), max(y, ay)
+            x2, y2 = min(x + w, ax + aw), min(y + h, ay + ah)
+            if x2 > x1 and y2 > y1:
+                clipped.append((x1, y1, x2 - x1, y2 - y1))
+        return clipped
+    
+    def build_rois(self, frame, motion_boxes):
+        """Dilate motion and known-face boxes into merged regions (None if a full scan is cheaper)"""
+        if self.config.FACE_TRACKING:
+            known = self.face_tracker.boxes
+        else:
+            known = frame.to_reduced(self.last_analysis['faces']) if self.last_analysis else []
+        
+        height, width = frame.gray.shape[:2]
+        padding = self.config.ROI_PADDING // frame.scale
+        regions = []
+        
+        for x, y, w, h in list(motion_boxes) + list(known):
+            pad = max(padding, w, h)
+            regions.append([max(0, x - pad), max(0, y - pad), min(width, x + w + pad), min(height, y + h + pad)])
+        
+        regions = self.merge_regions(np.array(regions, dtype=np.int64).reshape(-1, 4))
+        rois = [(int(x1), int(y1), int(x2 - x1), int(y2 - y1)) for x1, y1, x2, y2 in regions]
+        
+        # Scanning most of the frame in pieces costs more than one full pass
+        if sum(w * h for (_, _, w, h) in rois) > 0.5 * width * height:
+            return None
+        
+        return rois
+    
+    @staticmethod
+    def merge_regions(regions):
+        """Merge overlapping (x1, y1, x2, y2) regions until none overlap"""
+        # Each round joins every connected group of overlapping regions at once,
+        # using a vectorised overlap matrix; merged boxes can grow into new overlaps
+        while len(regions) > 1:
+            x1, y1, x2, y2 = regions.T
+            overlap = ((x1[:, None] < x2[None, :]) & (x1[None, :] < x2[:, None]) &
+                       (y1[:, None] < y2[None, :]) & (y1[None, :] < y2[:, None]))
+            
+            # Connected components by propagating the smallest index through the overlaps
+            labels = np.arange(len(regions))
+            while True:
+                spread = np.where(overlap, labels[None, :], len(regions)).min(axis=1)
+                if np.array_equal(spread, labels):
+                    break
+                labels = spread
+            
+            groups, labels = np.unique(labels, return_inverse=True)
+            if len(groups) == len(regions):
+                break
+            
+            merged = np.empty((len(groups), 4), dtype=regions.dtype)
+            merged[:, :2] = np.iinfo(regions.dtype).max
+            merged[:, 2:] = np.iinfo(regions.dtype).min
+            np.minimum.at(merged[:, 0], labels, x1)
+            np.minimum.at(merged[:, 1], labels, y1)
+            np.maximum.at(merged[:, 2], labels, x2)
+            np.maximum.at(merged[:, 3], labels, y2)
+            regions = merged
+        
+        return regions
+    
     def detect_paper_passing(self, frame, faces):
         """Detect paper passing between students"""
         result = {
@@ -477,8 +1634,8 @@ class ExamMode:
         if len(faces) < 2:
             return result
         
-        # Detect paper-like objects
-        papers = self.paper_detector.detect_papers(frame)
+        # Detect paper-like objects on the reduced colour view
+        papers = self.paper_detector.detect_papers(frame.small_color, scale=frame.scale)
         
         if len(papers) == 0:
             return result
@@ -544,24 +1701,16 @@ class ExamMode:
         
         return result
     
-    def detect_unusual_movements(self, frame, faces):
-        """Detect unusual movements"""
-        result = {
-            'detected': False,
-            'description': '',
-            'confidence': 0.0
-        }
-        
-        if len(faces) == 0:
-            return result
-        
-        # Simple motion detection around faces
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
-        
-        if not hasattr(self, 'last_gray_frame'):
+    def compute_motion(self, frame):
+        """Find large motion regions against the previous frame (reduced-view coordinates)"""
+        # Simple frame differencing on the reduced view
+        scale = frame.scale
+        blur_size = max(3, (21 // scale) | 1)
+        gray = cv2.GaussianBlur(frame.gray, (blur_size, blur_size), 0)
+        
+        if not hasattr(self, 'last_gray_frame') or self.last_gray_frame.shape != gray.shape:
             self.last_gray_frame = gray
-            return result
+            return []
         
         # Compute difference
         frame_delta = cv2.absdiff(self.last_gray_frame, gray)
@@ -571,29 +1720,40 @@ class ExamMode:
         # Find contours
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
+        self.last_gray_frame = gray
+        
+        min_area = self.config.EXAM_MOTION_THRESHOLD / (scale * scale)
+        return [cv2.boundingRect(contour) for contour in contours if cv2.contourArea(contour) > min_area]
+    
+    def detect_unusual_movements(self, frame, faces, motion_boxes):
+        """Detect unusual movements"""
+        result = {
+            'detected': False,
+            'description': '',
+            'confidence': 0.0
+        }
+        
+        if len(faces) == 0:
+            return result
+        
         # Check for large motion near faces
         large_motion_near_faces = False
         
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > self.config.EXAM_MOTION_THRESHOLD:
-                x, y, w, h = cv2.boundingRect(contour)
-                motion_center = (x + w//2, y + h//2)
-                
-                # Check if near any face
-                for fx, fy, fw, fh in faces:
-                    face_center = (fx + fw//2, fy + fh//2)
-                    distance = np.sqrt((motion_center[0] - face_center[0])**2 + 
-                                     (motion_center[1] - face_center[1])**2)
-                    
-                    if distance < 150:
-                        large_motion_near_faces = True
-                        break
+        for x, y, w, h in frame.to_full(motion_boxes):
+            motion_center = (x + w//2, y + h//2)
+            
+            # Check if near any face
+            for fx, fy, fw, fh in faces:
+                face_center = (fx + fw//2, fy + fh//2)
+                distance = np.sqrt((motion_center[0] - face_center[0])**2 + 
+                                 (motion_center[1] - face_center[1])**2)
                 
-                if large_motion_near_faces:
+                if distance < 150:
+                    large_motion_near_faces = True
                     break
-        
-        self.last_gray_frame = gray
+            
+            if large_motion_near_faces:
+                break
         
         if large_motion_near_faces:
             result['detected'] = True
@@ -602,6 +1762,13 @@ class ExamMode:
         
         return result
     
+    @property
+    def file_prefix(self):
+        """Filename prefix that keeps each hall room's evidence apart ('' for the single camera)"""
+        if not self.room:
+            return ""
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', str(self.room)) + "_"
+    
     def start_recording(self, event_time):
         """Start recording video for suspicious event"""
         if self.is_recording:
@@ -618,9 +1785,12 @@ class ExamMode:
             if event_time - timestamp <= self.config.EXAM_PRE_EVENT_BUFFER:
                 pre_event_frames.append(frame)
         
+        # Buffered frames are decoded to full colour only now
+        pre_event_frames = [frame.color for frame in pre_event_frames if frame.color is not None]
+        
         # Create timestamp for filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        video_filename = f"exam_videos/cheating_{timestamp}.avi"
+        video_filename = f"exam_videos/{self.file_prefix}cheating_{timestamp}.avi"
         
         # Get frame dimensions from first frame
         if pre_event_frames:
@@ -652,7 +1822,7 @@ class ExamMode:
         # Write pre-event frames
         for frame in pre_event_frames:
             self.video_writer.write(frame)
-            self.current_video_frames.append(frame.copy())
+            self.current_video_frames.append(frame)
         
         print(f"[EXAM] ✓ Recording started: {video_filename}")
         print(f"[EXAM]   Pre-event: {len(pre_event_frames)} frames ({self.config.EXAM_PRE_EVENT_BUFFER}s)")
@@ -664,7 +1834,10 @@ class ExamMode:
         
         # Write remaining frames
         for frame in self.current_video_frames:
-            self.video_writer.write(frame)
+            if isinstance(frame, DualFrame):
+                frame = frame.color
+            if frame is not None:
+                self.video_writer.write(frame)
         
         # Release video writer
         self.video_writer.release()
@@ -686,6 +1859,7 @@ class ExamMode:
         
         log_entry = {
             'timestamp': timestamp,
+            'room': self.room or 'default',
             'event_type': event_type,
             'details': details
         }
@@ -696,26 +1870,28 @@ class ExamMode:
         log_file = f"exam_logs/exam_{datetime.now().strftime('%Y%m%d')}.log"
         try:
             with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"{timestamp} | {event_type} | {details.get('description', '')} | "
-                       f"Confidence: {details.get('confidence', 0):.2f}\n")
+                f.write(f"{timestamp} | {self.room or 'default'} | {event_type} | "
+                       f"{details.get('description', '')} | Confidence: {details.get('confidence', 0):.2f}\n")
         except Exception as e:
             print(f"[EXAM] Error saving log: {e}")
     
-    def save_evidence_image(self, frame, faces, event_type, details):
-        """Save evidence image"""
+    def save_evidence_image(self, frame, faces, event_type, details, confidences=None):
+        """Save evidence image (faces labelled with cascade agreement when known)"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Create annotated frame
         annotated_frame = frame.copy()
         
         # Draw faces
-        for (x, y, w, h) in faces:
+        for i, (x, y, w, h) in enumerate(faces):
+            label = f"Student {confidences[i]:.0%}" if confidences else "Student"
             cv2.rectangle(annotated_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.putText(annotated_frame, "Student", (x, y - 10),
+            cv2.putText(annotated_frame, label, (x, y - 10),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         
         # Add alert information
-        cv2.putText(annotated_frame, f"ALERT: {event_type}", (10, 30),
+        alert = f"ALERT: {event_type} ({self.room})" if self.room else f"ALERT: {event_type}"
+        cv2.putText(annotated_frame, alert, (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
         cv2.putText(annotated_frame, details.get('description', ''), (10, 60),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
@@ -723,18 +1899,27 @@ class ExamMode:
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
         
         # Save image
-        filename = f"exam_suspicious/{event_type}_{timestamp}.jpg"
+        filename = f"exam_suspicious/{self.file_prefix}{event_type}_{timestamp}.jpg"
         cv2.imwrite(filename, annotated_frame)
         
         print(f"[EXAM] Saved evidence image: {filename}")
     
-    def show_debug_view(self, frame, faces, suspicious=False, activity_type=""):
+    def show_debug_view(self, frame, faces, suspicious=False, activity_type="", confidences=None):
         """Show debug view"""
         debug_frame = frame.copy()
         
-        # Draw faces
-        for (x, y, w, h) in faces:
+        # Draw faces, labelled with their track IDs and cascade agreement
+        track_ids = self.face_tracker.track_ids if self.config.FACE_TRACKING else []
+        for i, (x, y, w, h) in enumerate(faces):
             cv2.rectangle(debug_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            labels = []
+            if len(track_ids) == len(faces):
+                labels.append(f"#{track_ids[i]}")
+            if confidences:
+                labels.append(f"{confidences[i]:.0%}")
+            if labels:
+                cv2.putText(debug_frame, " ".join(labels), (x, y - 5),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         
         # Draw status
         status = "NORMAL"
@@ -754,13 +1939,69 @@ class ExamMode:
                        (debug_frame.shape[1] - 200, 30),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
         
-        cv2.imshow("Exam Monitoring", debug_frame)
+        window_name = f"Exam Monitoring - {self.room}" if self.room else "Exam Monitoring"
+        cv2.imshow(window_name, debug_frame)
         cv2.waitKey(1)
     
-    def calibrate_exam_mode(self):
-        """Calibrate exam mode"""
-        print("\n[EXAM] Calibration not needed for this version")
-        print("[EXAM] The system automatically adapts to environment")
+    @property
+    def detection_scale(self):
+        """Reduced-view scale for this room (calibrated, or from config)"""
+        if self.calibration is not None:
+            return self.calibration['scale']
+        return self.config.EXAM_DETECTION_SCALE
+    
+    def apply_calibration(self, settings):
+        """Use calibrated face sizes and search region for detection"""
+        self.calibration = settings
+        self.face_detector.size_bounds = (settings['min_size'], settings['max_size'])
+    
+    def calibrate_exam_mode(self, duration=None):
+        """Sample frames to learn face sizes, detection scale and search region for this room"""
+        if self.exam_active:
+            print("[EXAM] Stop monitoring before calibrating")
+            return False
+        
+        duration = duration or self.config.CALIBRATION_DURATION
+        label = self.room or "this room"
+        print(f"\n[EXAM] Calibrating {label} for {duration}s - students should be seated as usual")
+        
+        detector = FaceDetector(self.config)
+        faces = []
+        frames = 0
+        frame_size = None
+        start = time.time()
+        
+        while time.time() - start < duration:
+            frame = self.camera.get_dual_frame(scale=1)
+            if frame is None:
+                time.sleep(0.5)
+                continue
+            
+            found = detector.survey_faces(frame)
+            frame_size = (frame.gray.shape[1], frame.gray.shape[0])
+            faces.extend(found)
+            frames += 1
+            print(f"  Frame {frames}: {len(found)} faces", end="\r")
+        
+        print()
+        
+        if frames < 3 or len(faces) < 3:
+            print(f"[EXAM] ✗ Not enough faces to calibrate ({len(faces)} in {frames} frames)")
+            return False
+        
+        settings = RoomCalibration.learn(faces, frame_size, frames)
+        
+        print(f"[EXAM] ✓ Learned from {len(faces)} faces in {frames} frames:")
+        print(f"  Face size:  {settings['min_size']}-{settings['max_size']} px")
+        print(f"  Scale:      1/{settings['scale']}")
+        x, y, w, h = settings['roi']
+        print(f"  Search ROI: x={x} y={y} {w}x{h} ({w * h / (frame_size[0] * frame_size[1]):.0%} of frame)")
+        
+        if RoomCalibration.save(self.room, settings):
+            print(f"[EXAM] ✓ Saved to {RoomCalibration.CALIBRATION_FILE}")
+        
+        self.apply_calibration(settings)
+        return True
     
     def show_exam_status(self):
         """Show exam status"""
@@ -776,6 +2017,34 @@ class ExamMode:
         
         print(f"Alerts Today:      {len(self.suspicious_events)}")
         
+        if hasattr(self.camera, 'supervisor'):
+            print(f"Camera Health:     {self.camera.supervisor.status_lines()[0]}")
+        
+        if self.frame_latencies:
+            avg_ms = 1000 * sum(self.frame_latencies) / len(self.frame_latencies)
+            print(f"Frames Processed:  {self.frames_processed} ({avg_ms:.0f} ms/frame)")
+        
+        if self.calibration is not None:
+            print(f"Calibration:       faces {self.calibration['min_size']}-{self.calibration['max_size']} px, "
+                  f"scale 1/{self.calibration['scale']} ({self.calibration['calibrated']})")
+        
+        if self.config.SKIP_UNCHANGED_FRAMES:
+            stats = self.fingerprint.get_stats()
+            print(f"Unchanged Frames:  {stats['reused']}/{stats['checks']} reused ({stats['reuse_rate']:.0%})")
+        
+        if self.frames_processed:
+            print("\nFace Detection:")
+            for line in self.face_detector.status_lines():
+                print(f"  {line}")
+            
+            if self.config.ROI_DETECTION:
+                print(f"  {self.full_sweeps} full-frame sweeps")
+            
+            if self.config.FACE_TRACKING:
+                print("\nFace Tracking:")
+                for line in self.face_tracker.status_lines():
+                    print(f"  {line}")
+        
         if self.suspicious_events:
             print("\nRecent Alerts:")
             for event in self.suspicious_events[-3:]:
@@ -827,13 +2096,14 @@ class ExamMode:
             return
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_file = f"exam_logs/exam_report_{timestamp}.txt"
+        report_file = f"exam_logs/{self.file_prefix}exam_report_{timestamp}.txt"
         
         try:
             with open(report_file, 'w', encoding='utf-8') as f:
                 f.write("EXAM MONITORING REPORT\n")
                 f.write("=" * 50 + "\n")
                 f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"Room: {self.room or 'default'}\n")
                 f.write(f"Total Alerts: {len(self.suspicious_events)}\n")
                 
                 # Count by type
@@ -857,10 +2127,13 @@ class PaperDetector:
     def __init__(self, config):
         self.config = config
     
-    def detect_papers(self, frame):
-        """Detect paper-like objects"""
+    def detect_papers(self, frame, scale=1):
+        """Detect paper-like objects (frame may be downscaled by scale)"""
         papers = []
         
+        if frame is None:
+            return papers
+        
         # Convert to HSV for color detection
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
         
@@ -881,66 +2154,533 @@ class PaperDetector:
         for contour in contours:
             area = cv2.contourArea(contour)
             
-            # Paper size range
-            if 500 < area < 10000:
+            # Paper size range (in full-resolution pixels)
+            if 500 < area * scale * scale < 10000:
                 x, y, w, h = cv2.boundingRect(contour)
                 
                 # Check aspect ratio (paper-like)
                 aspect_ratio = w / h
                 if 0.5 < aspect_ratio < 2.0:
-                    papers.append((x, y, w, h))
+                    papers.append((x * scale, y * scale, w * scale, h * scale))
         
         return papers
 
+# ================= CAMERA HTTP SESSION =================
+class CameraHTTPSession:
+    """Pooled keep-alive HTTP connections to one camera"""
+    def __init__(self, host, port, timeout=5, pool_size=2):
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self.pool = queue.LifoQueue(maxsize=max(1, pool_size))
+        self.lock = threading.Lock()
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0',
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive'
+        }
+        
+        # Connection statistics
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.failed_requests = 0
+    
+    def new_connection(self):
+        """Open a new connection with its own timeout"""
+        with self.lock:
+            self.new_connections += 1
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def acquire(self):
+        """Take an idle connection from the pool or open a new one"""
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            return self.new_connection(), False
+        
+        with self.lock:
+            self.reused_connections += 1
+        return conn, True
+    
+    def release(self, conn, response):
+        """Return a connection to the pool if the server keeps it open"""
+        if response.will_close:
+            conn.close()
+            return
+        
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def request(self, conn, path):
+        """Send a GET request and read the full response body"""
+        conn.request('GET', path, headers=self.headers)
+        response = conn.getresponse()
+        body = response.read()
+        return response, body
+    
+    def get(self, path):
+        """GET a path and return the response body"""
+        conn, reused = self.acquire()
+        
+        try:
+            response, body = self.request(conn, path)
+        except (http.client.RemoteDisconnected, ConnectionError):
+            conn.close()
+            if not reused:
+                with self.lock:
+                    self.failed_requests += 1
+                raise
+            
+            # Idle connection was closed by the phone - retry once on a new one
+            conn = self.new_connection()
+            try:
+                response, body = self.request(conn, path)
+            except Exception:
+                conn.close()
+                with self.lock:
+                    self.failed_requests += 1
+                raise
+        except Exception:
+            conn.close()
+            with self.lock:
+                self.failed_requests += 1
+            raise
+        
+        self.release(conn, response)
+        
+        if response.status != 200:
+            with self.lock:
+                self.failed_requests += 1
+            raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+        
+        return body
+    
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def get_stats(self):
+        """Get connection statistics"""
+        with self.lock:
+            total = self.new_connections + self.reused_connections
+            return {
+                'new_connections': self.new_connections,
+                'reused_connections': self.reused_connections,
+                'failed_requests': self.failed_requests,
+                'reuse_rate': self.reused_connections / total if total else 0.0
+            }
+
+# ================= MJPEG STREAM =================
+class LatestFrameSlot:
+    """Holds only the newest frame - older unread frames are dropped"""
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.data = None
+        self.timestamp = 0
+        self.sequence = 0
+        self.consumed_sequence = 0
+        self.published_frames = 0
+        self.dropped_frames = 0
+    
+    def publish(self, data):
+        """Replace the slot contents with a new frame"""
+        with self.condition:
+            if self.sequence > self.consumed_sequence:
+                self.dropped_frames += 1
+            
+            self.data = data
+            self.timestamp = time.time()
+            self.sequence += 1
+            self.published_frames += 1
+            self.condition.notify_all()
+    
+    def take(self, timeout=0):
+        """Get the newest unread frame, waiting up to timeout seconds"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > self.consumed_sequence, timeout)
+            
+            if self.sequence == self.consumed_sequence:
+                return None, 0
+            
+            self.consumed_sequence = self.sequence
+            return self.data, self.timestamp
+    
+    def clear(self):
+        """Forget any unread frame"""
+        with self.condition:
+            self.consumed_sequence = self.sequence
+
+
+class MJPEGStream:
+    """Reads the camera's MJPEG endpoint on a background thread"""
+    def __init__(self, config):
+        self.config = config
+        self.path = config.STREAM_PATH
+        self.slot = LatestFrameSlot()
+        self.running = False
+        self.connected = False
+        self.thread = None
+        self.reconnects = 0
+    
+    def start(self):
+        """Start the reader thread"""
+        if self.running:
+            return
+        
+        self.running = True
+        self.thread = threading.Thread(target=self.stream_loop, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the reader thread"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.config.CONNECTION_TIMEOUT + 1)
+        self.thread = None
+    
+    def stream_loop(self):
+        """Keep the stream connected and publish every frame into the slot"""
+        while self.running:
+            conn = http.client.HTTPConnection(
+                self.config.PHONE_IP,
+                int(self.config.PHONE_PORT),
+                timeout=self.config.CONNECTION_TIMEOUT
+            )
+            
+            try:
+                conn.request('GET', self.path, headers={'User-Agent': 'Mozilla/5.0'})
+                response = conn.getresponse()
+                
+                if response.status != 200:
+                    raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+                
+                boundary = self.get_boundary(response.getheader('Content-Type', ''))
+                self.connected = True
+                
+                while self.running:
+                    data = self.read_part(response, boundary)
+                    if data is None:
+                        break  # Stream ended
+                    if data:
+                        self.slot.publish(data)
+                        
+            except Exception as e:
+                if self.config.DEBUG and self.running:
+                    print(f"  Stream error: {str(e)[:100]}")
+            finally:
+                self.connected = False
+                conn.close()
+            
+            if self.running:
+                self.reconnects += 1
+                time.sleep(1)  # Wait before reconnect
+    
+    def get_boundary(self, content_type):
+        """Extract the multipart boundary from the Content-Type header"""
+        for param in content_type.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'boundary':
+                return value.strip('"').lstrip('-').encode()
+        return b''
+    
+    def read_part(self, response, boundary):
+        """Read one multipart part and return its JPEG bytes"""
+        headers = {}
+        
+        # Skip boundary lines and read the part headers
+        while True:
+            line = response.readline()
+            if not line:
+                return None
+            
+            line = line.strip()
+            if not line:
+                if headers:
+                    break
+                continue
+            
+            if line.startswith(b'--') and boundary in line:
+                continue
+            
+            key, _, value = line.partition(b':')
+            headers[key.strip().lower()] = value.strip()
+        
+        length = headers.get(b'content-length')
+        if length:
+            data = response.read(int(length))
+            if len(data) < int(length):
+                return None
+            return data
+        
+        # No Content-Length - read until the next boundary line
+        chunks = []
+        while True:
+            line = response.readline()
+            if not line:
+                return None
+            if line.startswith(b'--') and boundary and boundary in line:
+                break
+            chunks.append(line)
+        
+        return b''.join(chunks).rstrip(b'\r\n')
+    
+    def get_stats(self):
+        """Get stream statistics"""
+        return {
+            'connected': self.connected,
+            'frames': self.slot.published_frames,
+            'dropped_frames': self.slot.dropped_frames,
+            'reconnects': self.reconnects
+        }
+
+# ================= CAMERA SUPERVISOR =================
+class CameraSupervisor:
+    """Tracks camera health and opens a circuit while the camera is down"""
+    HEALTHY = 'healthy'
+    DEGRADED = 'degraded'
+    DOWN = 'down'
+    
+    def __init__(self, failure_threshold=3, backoff_base=1.0, max_backoff=30.0):
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        
+        self.state = self.HEALTHY
+        self.state_since = time.time()
+        self.started = time.time()
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.last_error = ""
+        
+        # Circuit breaker
+        self.next_attempt_time = 0
+        
+        # Outage metrics
+        self.down_since = None
+        self.downtime_total = 0.0
+        self.outages = 0
+        self.reconnect_times = queue.deque(maxlen=20)
+    
+    def set_state(self, state):
+        """Change health state"""
+        if state != self.state:
+            self.state = state
+            self.state_since = time.time()
+    
+    def allow_request(self):
+        """Check if a camera request may be made now (False while the circuit is open)"""
+        with self.lock:
+            if self.state != self.DOWN:
+                return True
+            
+            now = time.time()
+            if now < self.next_attempt_time:
+                return False
+            
+            # Half-open: let this probe through and hold back the others
+            self.next_attempt_time = now + self.backoff_delay()
+            return True
+    
+    def probe_now(self):
+        """Allow the next request through even if the circuit is open"""
+        with self.lock:
+            self.next_attempt_time = 0
+    
+    def backoff_delay(self):
+        """Exponential backoff with jitter"""
+        exponent = max(0, self.consecutive_failures - self.failure_threshold)
+        delay = min(self.max_backoff, self.backoff_base * 2 ** exponent)
+        return delay * random.uniform(0.5, 1.0)
+    
+    def record_success(self):
+        """Record a successful frame"""
+        with self.lock:
+            self.total_successes += 1
+            self.consecutive_failures = 0
+            
+            if self.state == self.DOWN:
+                reconnect_time = time.time() - self.down_since
+                self.reconnect_times.append(reconnect_time)
+                self.downtime_total += reconnect_time
+                self.down_since = None
+                print(f"[CAMERA] ✓ Camera back online after {reconnect_time:.1f}s")
+            
+            self.set_state(self.HEALTHY)
+    
+    def record_failure(self, error=""):
+        """Record a failed request"""
+        with self.lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)[:100]
+            
+            if self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.DOWN:
+                    self.down_since = time.time()
+                    self.outages += 1
+                    self.set_state(self.DOWN)
+                    print(f"[CAMERA] ✗ Camera down after {self.consecutive_failures} failures - "
+                          f"backing off (last error: {self.last_error})")
+                
+                self.next_attempt_time = time.time() + self.backoff_delay()
+            else:
+                self.set_state(self.DEGRADED)
+    
+    def get_stats(self):
+        """Get health and uptime metrics"""
+        with self.lock:
+            now = time.time()
+            downtime = self.downtime_total
+            if self.down_since is not None:
+                downtime += now - self.down_since
+            
+            elapsed = max(now - self.started, 1e-6)
+            reconnects = list(self.reconnect_times)
+            
+            return {
+                'state': self.state,
+                'state_for': now - self.state_since,
+                'uptime': 1.0 - downtime / elapsed,
+                'outages': self.outages,
+                'failures': self.total_failures,
+                'consecutive_failures': self.consecutive_failures,
+                'last_reconnect': reconnects[-1] if reconnects else None,
+                'avg_reconnect': sum(reconnects) / len(reconnects) if reconnects else None,
+                'retry_in': max(0.0, self.next_attempt_time - now) if self.state == self.DOWN else 0.0,
+                'last_error': self.last_error
+            }
+    
+    def status_lines(self):
+        """Format health metrics for status output"""
+        stats = self.get_stats()
+        lines = [f"{stats['state'].upper()} for {stats['state_for']:.0f}s, "
+                 f"uptime {stats['uptime']:.1%}, {stats['outages']} outage(s)"]
+        
+        if stats['last_reconnect'] is not None:
+            lines.append(f"reconnect last {stats['last_reconnect']:.1f}s, avg {stats['avg_reconnect']:.1f}s")
+        if stats['state'] == self.DOWN:
+            lines.append(f"next retry in {stats['retry_in']:.1f}s - {stats['last_error']}")
+        
+        return lines
+
 # ================= CAMERA MANAGER =================
 class CameraManager:
     def __init__(self, config):
         self.config = config
         self.connection_retries = 0
         self.last_successful_connection = 0
+        self.session = CameraHTTPSession(
+            config.PHONE_IP,
+            config.PHONE_PORT,
+            timeout=config.CONNECTION_TIMEOUT,
+            pool_size=config.CAMERA_POOL_SIZE
+        )
+        
+        # Health tracking with backoff and circuit breaker
+        self.supervisor = CameraSupervisor(
+            failure_threshold=config.CAMERA_FAILURE_THRESHOLD,
+            max_backoff=config.CAMERA_MAX_BACKOFF
+        )
+        
+        # Streaming ingest (MJPEG) instead of /shot.jpg polling
+        self.stream = None
+        if config.CAPTURE_MODE == 'stream':
+            self.stream = MJPEGStream(config)
         
     def get_single_frame(self, max_retries=3):
-        """Get a single frame"""
+        """Get a single full-colour frame"""
+        frame = self.get_dual_frame(max_retries, color=True)
+        return frame.color if frame is not None else None
+    
+    def get_dual_frame(self, max_retries=3, color=False, scale=None):
+        """Get a frame whose full-colour view is decoded lazily"""
+        # Read the newest streamed frame when the stream is up
+        if self.stream is not None:
+            frame = self.get_stream_frame(color, scale)
+            if frame is not None:
+                return frame
+        
+        last_error = None
         for attempt in range(max_retries):
+            # Short growing pause between attempts so one blip isn't retried instantly
+            if attempt:
+                time.sleep(min(0.1 * 2 ** (attempt - 1), 1.0))
+            
+            # Stop while the camera is down (circuit open); a failed probe is still recorded below
+            if not self.supervisor.allow_request():
+                break
+            
             try:
-                url = f"http://{self.config.PHONE_IP}:{self.config.PHONE_PORT}/shot.jpg"
-                
-                socket.setdefaulttimeout(self.config.CONNECTION_TIMEOUT)
-                
-                req = urllib.request.Request(url, headers={
-                    'User-Agent': 'Mozilla/5.0',
-                    'Cache-Control': 'no-cache'
-                })
-                
-                response = urllib.request.urlopen(req, timeout=self.config.CONNECTION_TIMEOUT)
-                img_data = response.read()
-                img_np = np.frombuffer(img_data, dtype=np.uint8)
-                frame = cv2.imdecode(img_np, cv2.IMREAD_COLOR)
+                img_data = self.session.get('/shot.jpg')
+                frame = self.wrap_frame(img_data, color, scale)
                 
                 if frame is not None:
-                    self.connection_retries = 0
-                    self.last_successful_connection = time.time()
-                    
-                    # Rotate if needed
-                    height, width = frame.shape[:2]
-                    if height > width:
-                        frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-                    
                     return frame
+                
+                last_error = "Could not decode frame"
                     
             except Exception as e:
                 if self.config.DEBUG:
                     error_msg = str(e)[:100]
                     print(f"  Camera attempt {attempt+1} failed: {error_msg}")
                 
-                self.connection_retries += 1
-                time.sleep(1)
+                last_error = e
+        
+        # One failed call is one failure for the circuit breaker, however many attempts it made
+        if last_error is not None:
+            self.supervisor.record_failure(last_error)
+            self.connection_retries = self.supervisor.consecutive_failures
         
         return None
     
+    def get_stream_frame(self, color=False, scale=None):
+        """Get the newest frame from the MJPEG stream"""
+        if not self.stream.running:
+            self.stream.start()
+            
+            # Give the stream a moment to deliver its first frame
+            img_data, _ = self.stream.slot.take(timeout=self.config.CONNECTION_TIMEOUT)
+        elif self.stream.connected:
+            img_data, _ = self.stream.slot.take(timeout=self.config.CONNECTION_TIMEOUT)
+        else:
+            return None  # Reconnecting - fall back to polling
+        
+        if img_data is None:
+            return None
+        
+        return self.wrap_frame(img_data, color, scale)
+    
+    def wrap_frame(self, img_data, color=False, scale=None):
+        """Wrap JPEG data in a DualFrame, decoding only the view that is needed now"""
+        frame = DualFrame(img_data, scale or self.config.EXAM_DETECTION_SCALE)
+        image = frame.color if color else frame.gray
+        
+        if image is None:
+            return None
+        
+        self.supervisor.record_success()
+        self.connection_retries = 0
+        self.last_successful_connection = time.time()
+        return frame
+    
+    def close(self):
+        """Stop streaming and close idle connections"""
+        if self.stream is not None:
+            self.stream.stop()
+        self.session.close()
+    
     def test_connection(self):
         """Test camera connection"""
         print("Testing camera connection...")
+        self.supervisor.probe_now()
         frame = self.get_single_frame(max_retries=2)
         
         if frame is not None:
@@ -950,13 +2690,294 @@ class CameraManager:
             print("✗ Camera connection failed!")
             return False, None
 
+# ================= MULTI-CAMERA CAPTURE SERVICE =================
+class CameraEndpoint:
+    """Settings, connection and statistics for one room camera"""
+    def __init__(self, room, ip, port, fps=10, timeout=5, path='/shot.jpg'):
+        self.room = room
+        self.ip = ip
+        self.port = int(port)
+        self.fps = fps
+        self.timeout = timeout
+        self.path = path
+        self.slot = LatestFrameSlot()
+        
+        # Keep-alive connection (owned by the service loop)
+        self.reader = None
+        self.writer = None
+        
+        # Health and statistics
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.last_latency = 0.0
+        self.last_error = ""
+        self.last_frame_time = 0
+    
+    def close_connection(self):
+        """Drop the keep-alive connection"""
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+    
+    def get_stats(self):
+        """Get endpoint statistics"""
+        return {
+            'room': self.room,
+            'address': f"{self.ip}:{self.port}",
+            'frames': self.slot.published_frames,
+            'dropped_frames': self.slot.dropped_frames,
+            'failures': self.failures,
+            'new_connections': self.new_connections,
+            'reused_connections': self.reused_connections,
+            'latency_ms': self.last_latency * 1000,
+            'last_error': self.last_error,
+            'last_frame_age': time.time() - self.last_frame_time if self.last_frame_time else None
+        }
+
+
+class CaptureService:
+    """Captures many room cameras from one asyncio loop on one thread"""
+    def __init__(self, config, endpoints, max_concurrency=16):
+        self.config = config
+        self.endpoints = {endpoint.room: endpoint for endpoint in endpoints}
+        self.max_concurrency = max_concurrency
+        self.max_backoff = 30.0
+        self.running = False
+        self.thread = None
+        self.loop = None
+        self.stop_event = None
+    
+    @classmethod
+    def from_config(cls, config):
+        """Build the service from the 'cameras' list in config.json"""
+        endpoints = []
+        for i, camera in enumerate(config.CAMERAS):
+            endpoints.append(CameraEndpoint(
+                camera.get('room', f"Room {i+1}"),
+                camera.get('phone_ip', config.PHONE_IP),
+                camera.get('phone_port', config.PHONE_PORT),
+                fps=camera.get('fps', config.EXAM_VIDEO_FPS),
+                timeout=camera.get('timeout', config.CONNECTION_TIMEOUT),
+                path=camera.get('path', '/shot.jpg')
+            ))
+        return cls(config, endpoints, max_concurrency=config.CAPTURE_MAX_CONCURRENCY)
+    
+    def start(self):
+        """Start the capture loop on a background thread"""
+        if self.running:
+            return
+        
+        self.running = True
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        self.thread.start()
+        print(f"[CAPTURE] ✓ Capturing {len(self.endpoints)} camera(s), "
+              f"max {self.max_concurrency} concurrent requests")
+    
+    def stop(self):
+        """Stop the capture loop"""
+        if not self.running:
+            return
+        
+        self.running = False
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.thread = None
+        print("[CAPTURE] Capture service stopped")
+    
+    async def run(self):
+        """Run one capture task per camera until stopped"""
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        tasks = [asyncio.create_task(self.capture_camera(endpoint, semaphore))
+                 for endpoint in self.endpoints.values()]
+        
+        if self.running:
+            await self.stop_event.wait()
+        
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for endpoint in self.endpoints.values():
+            endpoint.close_connection()
+        self.loop = None
+    
+    async def capture_camera(self, endpoint, semaphore):
+        """Poll one camera at its frame-rate target with backoff on errors"""
+        interval = 1.0 / endpoint.fps
+        next_time = time.monotonic()
+        
+        while self.running:
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            start = time.monotonic()
+            try:
+                async with semaphore:
+                    img_data = await asyncio.wait_for(self.fetch(endpoint), endpoint.timeout)
+                
+                endpoint.last_latency = time.monotonic() - start
+                endpoint.last_frame_time = time.time()
+                endpoint.consecutive_failures = 0
+                endpoint.slot.publish(img_data)
+                
+                # Don't burst to catch up after a slow request
+                next_time = max(next_time + interval, time.monotonic())
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                endpoint.close_connection()
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                endpoint.last_error = str(e)[:100] or type(e).__name__
+                
+                # Exponential backoff with jitter
+                backoff = min(self.max_backoff, 0.5 * 2 ** (endpoint.consecutive_failures - 1))
+                next_time = time.monotonic() + backoff * random.uniform(0.5, 1.0)
+                
+                if self.config.DEBUG:
+                    print(f"  [CAPTURE] {endpoint.room}: {endpoint.last_error} "
+                          f"(retry in {next_time - time.monotonic():.1f}s)")
+    
+    async def fetch(self, endpoint):
+        """GET a JPEG over the endpoint's keep-alive connection"""
+        reused = endpoint.writer is not None
+        
+        try:
+            return await self.request(endpoint)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+            
+            # Idle connection was closed by the camera - retry once on a new one
+            endpoint.close_connection()
+            return await self.request(endpoint)
+    
+    async def request(self, endpoint):
+        """Send one HTTP/1.1 request and read the response body"""
+        if endpoint.writer is None:
+            endpoint.reader, endpoint.writer = await asyncio.open_connection(endpoint.ip, endpoint.port)
+            endpoint.new_connections += 1
+        else:
+            endpoint.reused_connections += 1
+        
+        reader, writer = endpoint.reader, endpoint.writer
+        writer.write((
+            f"GET {endpoint.path} HTTP/1.1\r\n"
+            f"Host: {endpoint.ip}:{endpoint.port}\r\n"
+            "User-Agent: Mozilla/5.0\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode())
+        await writer.drain()
+        
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by camera")
+        
+        parts = status_line.decode('latin-1').split(None, 2)
+        status = int(parts[1])
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        
+        if 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self.read_chunked(reader)
+        else:
+            body = await reader.read()
+            headers['connection'] = 'close'
+        
+        if headers.get('connection', '').lower() == 'close':
+            endpoint.close_connection()
+        
+        if status != 200:
+            raise ConnectionError(f"HTTP {status}")
+        
+        return body
+    
+    async def read_chunked(self, reader):
+        """Read a chunked transfer-encoded body"""
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        return b''.join(chunks)
+    
+    def get_camera(self, room):
+        """Get a camera object for one room that analysis code can poll"""
+        return RoomCamera(self, self.endpoints[room])
+    
+    def show_status(self):
+        """Show per-camera capture statistics"""
+        print("\n" + "=" * 70)
+        print("CAPTURE SERVICE STATUS")
+        print("=" * 70)
+        print(f"Service: {'RUNNING' if self.running else 'STOPPED'} - "
+              f"{len(self.endpoints)} camera(s), max {self.max_concurrency} concurrent")
+        
+        for endpoint in self.endpoints.values():
+            stats = endpoint.get_stats()
+            age = f"{stats['last_frame_age']:.1f}s ago" if stats['last_frame_age'] is not None else "never"
+            print(f"  {stats['room']:<16} {stats['address']:<21} frames={stats['frames']:<6} "
+                  f"dropped={stats['dropped_frames']:<5} failures={stats['failures']:<4} "
+                  f"latency={stats['latency_ms']:.0f}ms last={age}")
+            if stats['last_error'] and stats['failures']:
+                print(f"  {'':<16} last error: {stats['last_error']}")
+        
+        print("=" * 70)
+
+
+class RoomCamera:
+    """Camera interface for one room, backed by the capture service"""
+    def __init__(self, service, endpoint):
+        self.service = service
+        self.endpoint = endpoint
+        self.config = service.config
+        self.last_successful_connection = 0
+    
+    def get_single_frame(self, max_retries=3):
+        """Get the newest captured frame for this room"""
+        frame = self.get_dual_frame(max_retries, color=True)
+        return frame.color if frame is not None else None
+    
+    def get_dual_frame(self, max_retries=3, color=False, scale=None):
+        """Get the newest captured frame, decoding only the view that is needed now"""
+        img_data, timestamp = self.endpoint.slot.take(timeout=self.endpoint.timeout)
+        if img_data is None:
+            return None
+        
+        frame = DualFrame(img_data, scale or self.config.EXAM_DETECTION_SCALE)
+        image = frame.color if color else frame.gray
+        if image is None:
+            return None
+        
+        self.last_successful_connection = timestamp
+        return frame
+
 # ================= SIMPLE DETECTOR =================
 class SimpleDetector:
     def __init__(self, config):
         self.config = config
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
         self.detection_count = 0
         
     def check_person_single_frame(self, frame):
@@ -964,12 +2985,23 @@ class SimpleDetector:
         if frame is None:
             return False, 0
             
+        # First cascade of the detection profile, at the profile's input resolution
+        available = CASCADES.ensure(self.config.FACE_CASCADES[:1])
+        if not available:
+            return False, 0
+        
+        scale = self.config.EXAM_DETECTION_SCALE
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(
+        if scale > 1:
+            gray = cv2.resize(gray, None, fx=1.0 / scale, fy=1.0 / scale, interpolation=cv2.INTER_AREA)
+        
+        min_side = max(1, 30 // scale)
+        faces = CASCADES.detect(
+            available[0],
             gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
+            scaleFactor=self.config.SCALE_FACTOR,
+            minNeighbors=self.config.MIN_NEIGHBORS,
+            minSize=(min_side, min_side)
         )
         
         if len(faces) > 0:
@@ -978,6 +3010,129 @@ class SimpleDetector:
         
         return False, 0
 
+# ================= PROFILE BENCHMARK =================
+class ProfileBenchmark:
+    """Runs every detection profile over a labelled image folder and reports speed and accuracy"""
+    LABELS_FILE = "labels.json"  # {"image.jpg": [[x, y, w, h], ...], ...}
+    MATCH_IOU = 0.4
+    
+    def __init__(self, config, image_dir):
+        self.config = config
+        self.image_dir = image_dir
+    
+    @staticmethod
+    def to_landscape(boxes, width):
+        """Map boxes labelled on a portrait image (of the given width) into DualFrame's rotated view"""
+        # ROTATE_90_COUNTERCLOCKWISE sends (x, y) to (y, width - x)
+        return [(y, width - x - w, h, w) for (x, y, w, h) in boxes]
+    
+    def load_samples(self):
+        """Load (name, jpeg bytes, labelled boxes) for every labelled image"""
+        labels_path = os.path.join(self.image_dir, self.LABELS_FILE)
+        if not os.path.exists(labels_path):
+            print(f"[BENCH] ✗ {labels_path} not found")
+            return []
+        
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+        
+        samples = []
+        for name, boxes in labels.items():
+            path = os.path.join(self.image_dir, name)
+            if not os.path.exists(path):
+                print(f"[BENCH] Skipping missing image {name}")
+                continue
+            with open(path, 'rb') as f:
+                jpeg_data = f.read()
+            
+            # Labels use the image file's own orientation; DualFrame turns portrait frames to landscape
+            boxes = [tuple(box) for box in boxes]
+            image = cv2.imdecode(np.frombuffer(jpeg_data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                print(f"[BENCH] Skipping unreadable image {name}")
+                continue
+            height, width = image.shape[:2]
+            if height > width:
+                boxes = self.to_landscape(boxes, width)
+            
+            samples.append((name, jpeg_data, boxes))
+        
+        return samples
+    
+    @staticmethod
+    def iou(a, b):
+        """Intersection over union of two (x, y, w, h) boxes"""
+        ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+        iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+        intersection = ix * iy
+        union = a[2] * a[3] + b[2] * b[3] - intersection
+        return intersection / union if union > 0 else 0.0
+    
+    def count_matches(self, detections, labels):
+        """Greedy one-to-one matching of detections to labels"""
+        unmatched = list(labels)
+        matches = 0
+        
+        for detection in detections:
+            best = max(unmatched, key=lambda label: self.iou(detection, label), default=None)
+            if best is not None and self.iou(detection, best) >= self.MATCH_IOU:
+                unmatched.remove(best)
+                matches += 1
+        
+        return matches
+    
+    def run_profile(self, name, samples):
+        """Time one profile over every sample and score it against the labels"""
+        config = copy.copy(self.config)
+        config.apply_profile(name)
+        config.FACE_DETECTION_MODE = 'all'  # Images are unrelated, so adaptive history would mislead
+        
+        detector = FaceDetector(config)
+        detector.cascades  # Load cascades before timing
+        
+        latencies = []
+        detected = matched = labelled = 0
+        
+        for _, jpeg_data, labels in samples:
+            start = time.time()
+            faces, _ = detector.detect_faces_dual(DualFrame(jpeg_data, config.EXAM_DETECTION_SCALE))
+            latencies.append(time.time() - start)
+            
+            detected += len(faces)
+            labelled += len(labels)
+            matched += self.count_matches(faces, labels)
+        
+        return {
+            'profile': name,
+            'ms_per_frame': 1000 * sum(latencies) / len(latencies),
+            'precision': matched / detected if detected else 0.0,
+            'recall': matched / labelled if labelled else 0.0,
+            'detected': detected,
+            'labelled': labelled,
+        }
+    
+    def run(self):
+        """Benchmark every profile and print a comparison table"""
+        samples = self.load_samples()
+        if not samples:
+            print("[BENCH] No labelled images to benchmark")
+            return []
+        
+        print(f"\n[BENCH] {len(samples)} labelled images in {self.image_dir}")
+        results = [self.run_profile(name, samples) for name in self.config.DETECTION_PROFILES]
+        
+        print("\n" + "=" * 66)
+        print(f"{'PROFILE':<12} {'MS/FRAME':>9} {'PRECISION':>10} {'RECALL':>8} {'FACES':>12}")
+        print("=" * 66)
+        for result in results:
+            marker = " *" if result['profile'] == self.config.DETECTION_PROFILE else ""
+            print(f"{result['profile']:<12} {result['ms_per_frame']:>9.1f} {result['precision']:>10.1%} "
+                  f"{result['recall']:>8.1%} {result['detected']:>5}/{result['labelled']:<6}{marker}")
+        print("=" * 66)
+        print("* current profile (set 'detection_profile' in config.json)")
+        
+        return results
+
 # ================= ADMIN MODE =================
 class AdminMode:
     def __init__(self, camera, face_db, config):
@@ -1005,10 +3160,13 @@ class CommandClassroom:
     def __init__(self, config):
         self.config = config
         self.camera = CameraManager(config)
+        CASCADES.max_instances = config.CASCADE_MAX_INSTANCES
         self.detector = SimpleDetector(config)
         self.face_db = SimpleFaceDatabase()
         self.admin_mode = AdminMode(self.camera, self.face_db, config)
         self.exam_mode = ExamMode(self.camera, self.face_db, config)
+        self.capture_service = None
+        self.hall_exams = {}
         self.state = {
             'person_detected': False,
             'lights_on': False,
@@ -1028,6 +3186,7 @@ class CommandClassroom:
         print("\nMAIN COMMANDS:")
         print("  test   - Test camera connection")
         print("  exam   - Enter EXAM mode (cheating detection)")
+        print("  hall   - Monitor all configured room cameras")
         print("  status - Show system status")
         print("  help   - Show all commands")
         print("  exit   - Exit program")
@@ -1042,7 +3201,92 @@ class CommandClassroom:
         print(f"Exam Mode:      {'Active' if self.exam_mode.active else 'Inactive'}")
         print(f"Exam Monitoring:{'Running' if self.exam_mode.exam_active else 'Stopped'}")
         print(f"Alerts Today:   {len(self.exam_mode.suspicious_events)}")
+        
+        health_lines = self.camera.supervisor.status_lines()
+        print(f"Camera Health:  {health_lines[0]}")
+        for line in health_lines[1:]:
+            print(f"                {line}")
+        
+        stats = self.camera.session.get_stats()
+        print(f"Connections:    {stats['new_connections']} new, {stats['reused_connections']} reused "
+              f"({stats['reuse_rate']:.0%} reuse)")
+        
+        if self.camera.stream is not None:
+            stream_stats = self.camera.stream.get_stats()
+            print(f"Stream:         {'Connected' if stream_stats['connected'] else 'Disconnected'} - "
+                  f"{stream_stats['frames']} frames, {stream_stats['dropped_frames']} dropped")
+        print(f"Hall Monitoring:{'Running' if self.hall_exams else 'Stopped'}")
+        
+        cascade_lines = CASCADES.status_lines()
+        print(f"Cascades:       {cascade_lines[0]}")
+        for line in cascade_lines[1:]:
+            print(f"                {line}")
         print("=" * 50)
+        
+        if self.capture_service is not None:
+            self.capture_service.show_status()
+    
+    def start_hall(self):
+        """Start exam monitoring for every camera in the 'cameras' list"""
+        if self.hall_exams:
+            print("[HALL] Hall monitoring is already running!")
+            return
+        
+        if not self.config.CAMERAS:
+            print("[HALL] No cameras configured - add a 'cameras' list to config.json")
+            return
+        
+        self.capture_service = CaptureService.from_config(self.config)
+        self.capture_service.start()
+        
+        for room in self.capture_service.endpoints:
+            exam = ExamMode(self.capture_service.get_camera(room), self.face_db, self.config, room=room)
+            exam.start_exam()
+            self.hall_exams[room] = exam
+        
+        print(f"[HALL] ✓ Monitoring {len(self.hall_exams)} room(s)")
+    
+    def run_benchmark(self):
+        """Benchmark every detection profile on a labelled image folder"""
+        image_dir = input("Labelled image folder [benchmark]: ").strip() or "benchmark"
+        ProfileBenchmark(self.config, image_dir).run()
+    
+    def calibrate_hall(self):
+        """Calibrate every configured room camera in parallel"""
+        if self.hall_exams:
+            print("[HALL] Stop hall monitoring before calibrating")
+            return
+        
+        if not self.config.CAMERAS:
+            print("[HALL] No cameras configured - add a 'cameras' list to config.json")
+            return
+        
+        service = CaptureService.from_config(self.config)
+        service.start()
+        
+        try:
+            exams = [ExamMode(service.get_camera(room), self.face_db, self.config, room=room)
+                     for room in service.endpoints]
+            threads = [threading.Thread(target=exam.calibrate_exam_mode, daemon=True) for exam in exams]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            service.stop()
+    
+    def stop_hall(self):
+        """Stop hall monitoring"""
+        if not self.hall_exams:
+            print("[HALL] Hall monitoring is not running!")
+            return
+        
+        for room, exam in self.hall_exams.items():
+            print(f"\n[HALL] Stopping {room}...")
+            exam.stop_exam()
+        self.hall_exams = {}
+        
+        self.capture_service.stop()
     
     def show_help(self):
         """Show help"""
@@ -1051,12 +3295,17 @@ class CommandClassroom:
         print("=" * 60)
         print("test     - Test camera connection")
         print("exam     - Enter EXAM mode for cheating detection")
+        print("hall     - Start monitoring all configured room cameras")
+        print("hallstop - Stop hall monitoring")
+        print("hallcal  - Calibrate every configured room camera")
+        print("benchmark - Compare detection profiles on labelled images")
         print("status   - Show system status")
         print("help     - Show this help")
         print("exit     - Exit program")
         print("\n[EXAM MODE COMMANDS]:")
         print("start     - Start cheating detection")
         print("stop      - Stop cheating detection")
+        print("calibrate - Learn face sizes and search region for this room")
         print("status    - Show exam status")
         print("logs      - View suspicious event logs")
         print("clear     - Clear exam logs")
@@ -1080,12 +3329,16 @@ def main():
             except KeyboardInterrupt:
                 print("\n\nExiting...")
                 classroom.exam_mode.stop_exam()
+                if classroom.hall_exams:
+                    classroom.stop_hall()
                 cv2.destroyAllWindows()
                 break
             
             if cmd == 'exit' or cmd == 'quit':
                 print("\nExiting program...")
                 classroom.exam_mode.stop_exam()
+                if classroom.hall_exams:
+                    classroom.stop_hall()
                 cv2.destroyAllWindows()
                 break
                 
@@ -1112,6 +3365,9 @@ def main():
                         elif exam_cmd == 'stop':
                             classroom.exam_mode.stop_exam()
                             
+                        elif exam_cmd == 'calibrate':
+                            classroom.exam_mode.calibrate_exam_mode()
+                            
                         elif exam_cmd == 'status':
                             classroom.exam_mode.show_exam_status()
                             
@@ -1123,12 +3379,13 @@ def main():
                             
                         elif exam_cmd == 'help':
                             print("\nExam Mode Commands:")
-                            print("  start   - Start cheating detection")
-                            print("  stop    - Stop cheating detection")
-                            print("  status  - Show exam status")
-                            print("  logs    - View suspicious event logs")
-                            print("  clear   - Clear exam logs")
-                            print("  exit    - Exit exam mode")
+                            print("  start     - Start cheating detection")
+                            print("  stop      - Stop cheating detection")
+                            print("  calibrate - Learn face sizes and search region for this room")
+                            print("  status    - Show exam status")
+                            print("  logs      - View suspicious event logs")
+                            print("  clear     - Clear exam logs")
+                            print("  exit      - Exit exam mode")
                             
                         elif exam_cmd == '':
                             continue
@@ -1146,6 +3403,18 @@ def main():
                 
                 cv2.destroyAllWindows()
                 
+            elif cmd == 'hall':
+                classroom.start_hall()
+                
+            elif cmd == 'hallstop':
+                classroom.stop_hall()
+                
+            elif cmd == 'hallcal':
+                classroom.calibrate_hall()
+                
+            elif cmd == 'benchmark':
+                classroom.run_benchmark()
+                
             elif cmd == 'status':
                 classroom.show_status()
                 
@@ -1163,6 +3432,11 @@ def main():
         print(f"\nFatal error: {e}")
     
     finally:
+        classroom.camera.close()
+        DETECTION_POOL.shutdown()
+        if classroom.capture_service is not None:
+            classroom.capture_service.stop()
+        
         # Final summary
         print("\n" + "=" * 60)
         print("SESSION SUMMARY")